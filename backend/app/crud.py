@@ -1,12 +1,28 @@
+import json
+import base64
+from sqlalchemy import or_, and_, cast, Text
 from sqlalchemy.orm import Session
-from .models import Interaction
-from datetime import datetime
+from .models import Interaction, make_uuid
+from . import search, metrics, rollups, hcps, items, similarity
+from datetime import datetime, date, timedelta
 
-def create_interaction(db: Session, data: dict, raw_text: str):
-    obj = Interaction(
+DATE_FIELDS = ("date", "follow_up_date")
+SIMILARITY_FIELDS = {"summary", "topics_discussed", "raw_text"}   # columns similarity.document() reads
+
+def _to_date(value):
+    """Accept date objects or ISO YYYY-MM-DD strings; anything else becomes None."""
+    if value is None or isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+def _interaction_fields(data: dict, raw_text: str):
+    return dict(
         raw_text = raw_text,
         hcp_name = data.get("hcp_name"),
-        date = data.get("date"),
+        date = _to_date(data.get("date")),
         time = data.get("time"),
         topics_discussed = data.get("topics_discussed"),
         materials_shared = data.get("materials_shared") or [],
@@ -14,13 +30,54 @@ def create_interaction(db: Session, data: dict, raw_text: str):
         sentiment = data.get("sentiment"),
         sentiment_source = data.get("sentiment_source"),
         outcomes = data.get("outcomes"),
-        follow_up_date = data.get("follow_up_date"),
+        follow_up_date = _to_date(data.get("follow_up_date")),
         summary = data.get("summary"),
-        created_at = datetime.utcnow()
+        created_at = datetime.utcnow(),
+        status = "done"
     )
+
+def create_interaction(db: Session, data: dict, raw_text: str):
+    obj = Interaction(**_interaction_fields(data, raw_text))
+    obj.hcp_id = hcps.resolve(db, obj.hcp_name)
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    db.flush()
+    search.index_interaction(db, obj.id)
+    rollups.apply_delta(db, None, rollups.contribution(obj))
+    items.insert_for(db, [obj])
+    with metrics.DB_COMMIT_SECONDS.time(op="create"):
+        db.commit()
+    similarity.index_interactions([obj])
+    return obj
+
+def bulk_create_interactions(db: Session, rows):
+    """
+    Insert many (data, raw_text) pairs with one executemany and one commit.
+    Returns the generated ids in input order.
+    """
+    mappings = []
+    for data, raw_text in rows:
+        fields = _interaction_fields(data, raw_text)
+        fields["id"] = make_uuid()
+        fields["hcp_id"] = hcps.resolve(db, fields["hcp_name"])
+        mappings.append(fields)
+    if mappings:
+        db.bulk_insert_mappings(Interaction, mappings)
+        search.index_interactions(db, [m["id"] for m in mappings])
+        for m in mappings:
+            rollups.apply_delta(db, None, rollups.contribution(m))
+        items.insert_for(db, mappings)
+        with metrics.DB_COMMIT_SECONDS.time(op="bulk_create"):
+            db.commit()
+        similarity.index_interactions(mappings)
+    return [m["id"] for m in mappings]
+
+def create_pending_interaction(db: Session, raw_text: str):
+    obj = Interaction(raw_text=raw_text, created_at=datetime.utcnow(), status="pending")
+    db.add(obj)
+    db.flush()
+    search.index_interaction(db, obj.id)
+    with metrics.DB_COMMIT_SECONDS.time(op="create_pending"):
+        db.commit()
     return obj
 
 def get_interaction(db: Session, interaction_id: str):
@@ -30,9 +87,147 @@ def update_interaction(db: Session, interaction_id: str, updates: dict):
     obj = get_interaction(db, interaction_id)
     if not obj:
         return None
+    before = rollups.contribution(obj)
     for k, v in updates.items():
         if hasattr(obj, k):
+            setattr(obj, k, _to_date(v) if k in DATE_FIELDS else v)
+    if "hcp_name" in updates:
+        obj.hcp_id = hcps.resolve(db, obj.hcp_name)
+    db.flush()
+    search.index_interaction(db, obj.id)
+    rollups.apply_delta(db, before, rollups.contribution(obj))
+    items.replace_for(db, obj)
+    with metrics.DB_COMMIT_SECONDS.time(op="update"):
+        db.commit()
+    if SIMILARITY_FIELDS & set(updates):
+        similarity.index_interactions([obj])
+    return obj
+
+def patch_interaction(db: Session, interaction_id: str, updates: dict):
+    """
+    Incremental update: write only non-empty values that differ from what is stored.
+    Returns (obj, changed_field_names) or (None, []) when the row doesn't exist.
+    """
+    obj = get_interaction(db, interaction_id)
+    if not obj:
+        return None, []
+    before = rollups.contribution(obj)
+    changed = []
+    for k, v in updates.items():
+        if not hasattr(obj, k) or v is None or v == [] or v == "":
+            continue
+        if k in DATE_FIELDS:
+            v = _to_date(v)
+            if v is None:
+                continue
+        if getattr(obj, k) != v:
             setattr(obj, k, v)
+            changed.append(k)
+    if "hcp_name" in changed:
+        obj.hcp_id = hcps.resolve(db, obj.hcp_name)
+    if changed:
+        db.flush()
+        search.index_interaction(db, obj.id)
+        rollups.apply_delta(db, before, rollups.contribution(obj))
+        items.replace_for(db, obj)
+        with metrics.DB_COMMIT_SECONDS.time(op="patch"):
+            db.commit()
+        if SIMILARITY_FIELDS & set(changed):
+            similarity.index_interactions([obj])
+    return obj, changed
+
+def _claimable(lease_seconds):
+    # pending, or running under a lease that ran out (its worker died)
+    stale = datetime.utcnow() - timedelta(seconds=lease_seconds)
+    return or_(Interaction.status == "pending",
+               and_(Interaction.status == "running",
+                    or_(Interaction.claimed_at.is_(None), Interaction.claimed_at < stale)))
+
+def claim_interaction(db: Session, interaction_id: str, lease_seconds: float):
+    """Atomically mark a pending (or lease-expired) row running; False when someone else has it."""
+    claimed = (db.query(Interaction)
+               .filter(Interaction.id == interaction_id, _claimable(lease_seconds))
+               .update({"status": "running", "error": None, "claimed_at": datetime.utcnow()},
+                       synchronize_session=False))
     db.commit()
-    db.refresh(obj)
-    return obj
+    return claimed == 1
+
+def fail_interaction(db: Session, interaction_id: str, error: str):
+    """Mark a running row failed without touching its derived data (which may be what broke)."""
+    db.rollback()
+    db.query(Interaction).filter(Interaction.id == interaction_id, Interaction.status == "running") \
+        .update({"status": "failed", "error": error}, synchronize_session=False)
+    db.commit()
+
+def get_unfinished_interaction_ids(db: Session, lease_seconds: float):
+    rows = db.query(Interaction.id).filter(_claimable(lease_seconds)).all()
+    return [r[0] for r in rows]
+
+def encode_cursor(obj: Interaction):
+    raw = json.dumps([obj.created_at.isoformat(), obj.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Returns (created_at, id) or raises ValueError."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, interaction_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(interaction_id)
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+
+def list_interactions(db: Session, hcp_name=None, date_from=None, date_to=None,
+                      sentiment=None, material=None, limit=50, cursor=None, hcp_id=None):
+    """
+    Newest-first page of interactions using keyset pagination on (created_at, id).
+    hcp_name is resolved to its canonical HCP, so any spelling of the name matches.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    q = db.query(Interaction)
+    if hcp_name and not hcp_id:
+        hcp_id = hcps.lookup(hcp_name)
+        if hcp_id is None:
+            return [], None
+    if hcp_id:
+        q = q.filter(Interaction.hcp_id == hcp_id)
+    if date_from:
+        q = q.filter(Interaction.date >= date_from)
+    if date_to:
+        q = q.filter(Interaction.date <= date_to)
+    if sentiment:
+        q = q.filter(Interaction.sentiment == sentiment)
+    if material:
+        pattern = f"%{material}%"
+        q = q.filter(or_(
+            cast(Interaction.materials_shared, Text).ilike(pattern),
+            cast(Interaction.samples_distributed, Text).ilike(pattern),
+        ))
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        q = q.filter(or_(
+            Interaction.created_at < created_at,
+            and_(Interaction.created_at == created_at, Interaction.id < last_id),
+        ))
+
+    rows = q.order_by(Interaction.created_at.desc(), Interaction.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def search_interactions(db: Session, q: str, limit=20):
+    """Full-text matches as (Interaction, score, snippet), best first."""
+    hits = search.search_interactions(db, q, limit=limit)
+    if not hits:
+        return []
+    by_id = {o.id: o for o in db.query(Interaction).filter(Interaction.id.in_([h[0] for h in hits]))}
+    return [(by_id[i], score, snippet) for i, score, snippet in hits if i in by_id]
+
+def similar_interactions(db: Session, k=5, interaction=None, text=None, exclude=()):
+    """Nearest past interactions as (Interaction, cosine), best first, never interaction itself or exclude."""
+    if interaction is not None:
+        hits = similarity.similar_to_interaction(interaction, k=k)
+    else:
+        hits = similarity.similar_to_text(text or "", k=k, exclude=exclude)
+    if not hits:
+        return []
+    by_id = {o.id: o for o in db.query(Interaction).filter(Interaction.id.in_([h[0] for h in hits]))}
+    return [(by_id[i], score) for i, score in hits if i in by_id]
@@ -1,5 +1,5 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, event, Date
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
@@ -7,10 +7,96 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
+# "production" applies the tuning below; "default" keeps SQLAlchemy/driver defaults
+DB_PROFILE = os.getenv("DB_PROFILE", "production").lower()
+
+# SQLite
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+# Postgres (and other server databases)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))     # compiled statement cache
+DB_PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", "5"))      # psycopg 3 server-side prepares
+
+is_sqlite = DATABASE_URL.startswith("sqlite")
+
 connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
+engine_kwargs = {}
+if is_sqlite:
     connect_args = {"check_same_thread": False}
+    if DB_PROFILE == "production":
+        connect_args["timeout"] = SQLITE_BUSY_TIMEOUT_MS / 1000.0
+elif DB_PROFILE == "production":
+    engine_kwargs = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+    )
+    if DATABASE_URL.startswith("postgresql+psycopg:"):
+        connect_args["prepare_threshold"] = DB_PREPARE_THRESHOLD
+
+engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True, **engine_kwargs)
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+if is_sqlite and DB_PROFILE == "production":
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers run alongside the single writer; busy_timeout waits
+        # for the write lock instead of failing with "database is locked"
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+# expire_on_commit=False: ids and timestamps are generated client-side, so the
+# in-memory object is already current after commit and needs no refresh SELECT
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False,
+                            expire_on_commit=False, future=True)
 Base = declarative_base()
+
+
+def sync_schema(metadata):
+    """
+    create_all() plus ALTER TABLE ... ADD COLUMN for columns added to models
+    after the table was first created (create_all never alters existing tables),
+    and CREATE INDEX for indexes added later.
+    New columns must be nullable or carry a server default.
+    """
+    metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                coltype = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {coltype}'))
+            _convert_date_columns(conn, inspector, table)
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _convert_date_columns(conn, inspector, table):
+    # SQLite stores Date as ISO text already, so only Postgres needs a type change
+    if engine.dialect.name != "postgresql":
+        return
+    reflected = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if isinstance(column.type, Date) and column.name in reflected \
+                and not isinstance(reflected[column.name], Date):
+            conn.execute(text(
+                f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" TYPE DATE '
+                f'USING NULLIF("{column.name}", \'\')::date'
+            ))
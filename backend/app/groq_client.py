@@ -0,0 +1,183 @@
+"""
+Shared HTTP client for the Groq chat-completions endpoint
+- One pooled keep-alive session per process (GROQ_POOL_SIZE connections)
+- HTTP/2 via httpx when installed (pip install "httpx[http2]") and GROQ_HTTP2 is on
+- Retries connection errors, 429 and 5xx with jittered exponential backoff,
+  honoring Retry-After
+- Optional client-side token buckets (GROQ_RPM / GROQ_TPM), off by default: set them
+  to the account tier's per-process share; a call takes from both or neither
+"""
+
+import os
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+except ImportError:
+    httpx = None
+
+GROQ_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "20"))
+GROQ_HTTP2 = os.getenv("GROQ_HTTP2", "true").lower() in ("1", "true", "yes")
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))   # seconds
+GROQ_BACKOFF_MAX = float(os.getenv("GROQ_BACKOFF_MAX", "8"))       # seconds
+GROQ_RPM = float(os.getenv("GROQ_RPM", "0"))                       # requests/minute, 0 = unlimited
+GROQ_TPM = float(os.getenv("GROQ_TPM", "0"))                       # tokens/minute, 0 = unlimited
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate_per_minute."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity or rate_per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, cost=1.0, deadline=None):
+        """Block until cost tokens are available. Returns False if deadline would pass first."""
+        return acquire_all([(self, cost)], deadline)
+
+
+def acquire_all(costs, deadline=None):
+    """
+    Take each (bucket, cost) at once, or nothing: no bucket is spent while
+    another is still short. Returns False if deadline would pass first.
+    """
+    costs = sorted(((b, min(float(c), b.capacity)) for b, c in costs), key=lambda bc: id(bc[0]))
+    while True:
+        for bucket, _ in costs:
+            bucket._lock.acquire()
+        try:
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, cost in costs:
+                bucket._refill(now)
+                if bucket.tokens < cost:
+                    wait = max(wait, (cost - bucket.tokens) / bucket.rate)
+            if not wait:
+                for bucket, cost in costs:
+                    bucket.tokens -= cost
+                return True
+        finally:
+            for bucket, _ in reversed(costs):
+                bucket._lock.release()
+        if deadline is not None and now + wait > deadline:
+            return False
+        time.sleep(wait)
+
+
+def _retry_after_seconds(headers):
+    value = headers.get("retry-after") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _estimate_tokens(payload):
+    # ~4 characters per token is close enough for budgeting
+    chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    return chars // 4 + int(payload.get("max_tokens") or 0)
+
+
+class GroqClient:
+    def __init__(self, pool_size=GROQ_POOL_SIZE, http2=GROQ_HTTP2, max_retries=GROQ_MAX_RETRIES,
+                 rpm=GROQ_RPM, tpm=GROQ_TPM):
+        self.max_retries = max_retries
+        self.http2 = bool(http2 and httpx is not None)
+        if self.http2:
+            self._session = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            )
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        self.request_bucket = TokenBucket(rpm) if rpm > 0 else None
+        self.token_bucket = TokenBucket(tpm) if tpm > 0 else None
+
+    def post(self, url, headers, payload, timeout=30, log=None):
+        """
+        POST payload as JSON, retrying transient failures inside the timeout budget.
+        Returns the last response (possibly still 429/5xx); raises the last
+        exception if no response was ever received.
+        """
+        log = log or (lambda msg: None)
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            if not self._throttle(payload, deadline):
+                raise TimeoutError("client-side rate limit: no capacity before deadline")
+
+            remaining = max(0.1, deadline - time.monotonic())
+            resp, error = None, None
+            try:
+                resp = self._session.post(url, headers=headers, json=payload, timeout=remaining)
+            except Exception as e:
+                error = e
+
+            if error is None and resp.status_code not in RETRY_STATUSES:
+                return resp
+            if attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return resp
+
+            delay = random.uniform(0, min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_BASE * (2 ** attempt)))
+            retry_after = _retry_after_seconds(resp.headers) if resp is not None else None
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            if time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return resp
+
+            reason = repr(error) if error is not None else f"status {resp.status_code}"
+            log(f"GROQ RETRY {attempt + 1}/{self.max_retries} after {delay:.2f}s ({reason})")
+            time.sleep(delay)
+            attempt += 1
+
+    def _throttle(self, payload, deadline):
+        costs = []
+        if self.request_bucket:
+            costs.append((self.request_bucket, 1))
+        if self.token_bucket:
+            costs.append((self.token_bucket, _estimate_tokens(payload)))
+        return acquire_all(costs, deadline) if costs else True
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide client; connections are reused across requests and threads."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GroqClient()
+        return _client
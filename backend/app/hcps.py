@@ -0,0 +1,299 @@
+"""
+Canonical HCP entities and the in-memory name resolver
+- normalize(): "Dr. J. Smith, MD" -> "j smith" (titles, credentials, punctuation dropped)
+- resolution order: exact normalized key -> same surname with compatible given
+  names/initials -> trigram similarity (surname typos) -> new Hcp row
+- the index loads lazily on first use (hcp rows plus the name forms already
+  linked from interaction) and is updated incrementally after each commit;
+  on a miss it first picks up hcp rows other processes (ingest CLI, other
+  workers) committed since, so their HCPs are found rather than duplicated
+- Hcp ids are uuid5(normalized key), so concurrent writers creating the same
+  HCP insert the same row and the second insert is a no-op
+- setup() links existing interactions that have a name but no hcp_id
+
+CLI:  python -m app.hcps backfill
+"""
+
+import os
+import re
+import json
+import uuid
+import argparse
+import threading
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from .models import Hcp, Interaction
+
+HCP_MATCH_THRESHOLD = float(os.getenv("HCP_MATCH_THRESHOLD", "0.6"))   # trigram Jaccard
+_NAMESPACE = uuid.UUID("5b0b6f6e-8a39-4c55-9f0e-3f1f6a3c9d21")
+_PENDING = "hcp_pending"      # session.info key: {key: (hcp_id, name or None)} until commit
+
+_TITLES = {"dr", "doctor", "prof", "professor", "mr", "mrs", "ms", "miss", "sir", "madam"}
+_CREDENTIALS = {"md", "mbbs", "phd", "do", "dds", "dmd", "rn", "np", "pa", "pharmd", "jr", "sr", "ii", "iii"}
+
+
+def normalize(name):
+    """Comparison key for a person's name; "" when nothing name-like is left."""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    tokens = re.findall(r"[a-z0-9]+", text)
+    while tokens and tokens[0] in _TITLES:
+        tokens.pop(0)
+    while len(tokens) > 1 and tokens[-1] in _CREDENTIALS:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def hcp_id_for(key):
+    return str(uuid.uuid5(_NAMESPACE, key))
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _given_compatible(a, b):
+    """Same surname assumed; given names match pairwise as names or initials."""
+    for x, y in zip(a.split()[:-1], b.split()[:-1]):
+        if not (x.startswith(y) or y.startswith(x)):
+            return False
+    return True
+
+
+class HcpIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.by_key = {}                       # normalized key -> hcp_id
+        self.names = {}                        # hcp_id -> canonical display name
+        self.keys_by_id = defaultdict(set)
+        self.by_surname = defaultdict(set)     # last token -> keys
+        self.by_trigram = defaultdict(set)     # trigram -> keys
+
+    def add(self, key, hcp_id, name=None):
+        with self._lock:
+            if name and hcp_id not in self.names:
+                self.names[hcp_id] = name
+            if key in self.by_key:
+                return
+            self.by_key[key] = hcp_id
+            self.keys_by_id[hcp_id].add(key)
+            self.by_surname[key.split()[-1]].add(key)
+            for tri in _trigrams(key):
+                self.by_trigram[tri].add(key)
+
+    def match(self, key):
+        """hcp_id for a normalized key, or None when it looks like a new HCP."""
+        with self._lock:
+            hcp_id = self.by_key.get(key)
+            if hcp_id:
+                return hcp_id
+
+            surname = key.split()[-1]
+            same_surname = {self.by_key[k] for k in self.by_surname.get(surname, ())}
+            compatible = [i for i in same_surname
+                          if all(_given_compatible(key, k) for k in self.keys_by_id[i])]
+            if len(compatible) == 1:
+                return compatible[0]
+            if compatible:
+                return None     # ambiguous: "smith" with both "j smith" and "k smith" on file
+
+            # trigram pass only for different surnames, i.e. spelling variants
+            grams = _trigrams(key)
+            shared = defaultdict(int)
+            for tri in grams:
+                for k in self.by_trigram.get(tri, ()):
+                    shared[k] += 1
+            best, best_score = set(), 0.0
+            for k, n in shared.items():
+                if k.split()[-1] == surname:
+                    continue
+                score = n / (len(grams) + len(_trigrams(k)) - n)
+                if score > best_score:
+                    best, best_score = {self.by_key[k]}, score
+                elif score == best_score:
+                    best.add(self.by_key[k])
+            if best_score >= HCP_MATCH_THRESHOLD and len(best) == 1:
+                return best.pop()
+            return None
+
+    def display_name(self, hcp_id):
+        with self._lock:
+            return self.names.get(hcp_id)
+
+    def size(self):
+        """Number of canonical HCPs known (aliases excluded)."""
+        with self._lock:
+            return len(self.names)
+
+
+_state = {"index": None}
+_load_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index, loaded from the database on first use."""
+    index = _state["index"]
+    if index is not None:
+        return index
+    with _load_lock:
+        if _state["index"] is None:
+            from .database import SessionLocal
+            index = HcpIndex()
+            db = SessionLocal()
+            try:
+                for hcp_id, name, key in db.query(Hcp.id, Hcp.name, Hcp.normalized_key):
+                    index.add(key, hcp_id, name)
+                # name forms already linked to an HCP become aliases
+                for name, hcp_id in (db.query(Interaction.hcp_name, Interaction.hcp_id)
+                                     .filter(Interaction.hcp_id.isnot(None)).distinct()):
+                    key = normalize(name)
+                    if key:
+                        index.add(key, hcp_id)
+            finally:
+                db.close()
+            _state["index"] = index
+    return _state["index"]
+
+
+def _refresh(index):
+    """Add hcp rows committed elsewhere since the index loaded; True when any were new."""
+    from .database import SessionLocal
+    with _load_lock:
+        db = SessionLocal()
+        try:
+            if db.query(func.count(Hcp.id)).scalar() <= index.size():
+                return False
+            before = index.size()
+            for hcp_id, name, key in db.query(Hcp.id, Hcp.name, Hcp.normalized_key):
+                index.add(key, hcp_id, name)
+            return index.size() > before
+        finally:
+            db.close()
+
+
+def _match(key):
+    index = get_index()
+    hcp_id = index.match(key)
+    if hcp_id is None and _refresh(index):
+        hcp_id = index.match(key)
+    return hcp_id
+
+
+def lookup(name):
+    """Resolve without creating: hcp_id or None."""
+    key = normalize(name)
+    return _match(key) if key else None
+
+
+def display_name(hcp_id):
+    if not hcp_id:
+        return None
+    index = get_index()
+    name = index.display_name(hcp_id)
+    if name is None and _refresh(index):
+        name = index.display_name(hcp_id)
+    return name
+
+
+def _insert_ignore(db, values):
+    table = Hcp.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.execute(insert(table).values(**values).on_conflict_do_nothing())
+    elif db.get(Hcp, values["id"]) is None:
+        db.execute(table.insert().values(**values))
+
+
+def resolve(db, name):
+    """
+    hcp_id for an extracted name, creating the Hcp row in the caller's
+    transaction when nothing matches. None for empty names.
+    """
+    key = normalize(name)
+    if not key:
+        return None
+    pending = db.info.setdefault(_PENDING, {})
+    if key in pending:
+        return pending[key][0]
+    hcp_id = _match(key)
+    if hcp_id is None:
+        hcp_id = hcp_id_for(key)
+        display = str(name).strip()
+        _insert_ignore(db, dict(id=hcp_id, name=display, normalized_key=key, created_at=datetime.utcnow()))
+        pending[key] = (hcp_id, display)
+    elif key not in get_index().by_key:
+        pending[key] = (hcp_id, None)
+    return hcp_id
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    # only committed HCPs enter the shared index; a loaded-later index reads them from the DB
+    pending = session.info.pop(_PENDING, None)
+    index = _state["index"]
+    if pending and index is not None:
+        for key, (hcp_id, name) in pending.items():
+            index.add(key, hcp_id, name)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop(_PENDING, None)
+
+
+def setup(batch_size=500):
+    """Link interactions that have a name but no hcp_id. Returns the number linked."""
+    from .database import SessionLocal
+    db = SessionLocal()
+    linked, last_id = 0, ""
+    try:
+        while True:
+            rows = (db.query(Interaction.id, Interaction.hcp_name)
+                    .filter(Interaction.hcp_id.is_(None), Interaction.hcp_name.isnot(None),
+                            Interaction.id > last_id)
+                    .order_by(Interaction.id).limit(batch_size).all())
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = [{"id": i, "hcp_id": resolve(db, name)} for i, name in rows]
+            updates = [u for u in updates if u["hcp_id"]]
+            if updates:
+                db.bulk_update_mappings(Interaction, updates)
+            db.commit()
+            linked += len(updates)
+    finally:
+        db.close()
+    return linked
+
+
+def main(argv=None):
+    from .database import sync_schema
+    from . import models
+
+    parser = argparse.ArgumentParser(description="Maintain the canonical HCP table.")
+    parser.add_argument("command", choices=("backfill",))
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    sync_schema(models.Base.metadata)
+    linked = setup(batch_size=args.batch_size)
+    if linked:
+        # rollups are keyed by canonical HCP, so newly linked rows move buckets
+        from . import rollups
+        rollups.setup(force=True)
+    print(json.dumps({"command": args.command, "linked": linked}))
+    return linked
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Bulk import of historical call notes
+- Streams JSONL or CSV input record by record (memory stays flat)
+- Runs extraction with bounded concurrency, one chunk at a time
+- Writes each chunk with a single executemany + commit
+- Resumable: a checkpoint file records how many input records are committed
+
+CLI:
+    python -m app.ingest notes.jsonl --checkpoint notes.ckpt
+    python -m app.ingest notes.csv --format csv --text-field note --concurrency 8 --chunk-size 200
+"""
+
+import os
+import io
+import csv
+import sys
+import json
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from .database import SessionLocal, sync_schema
+from . import models, crud, langgraph_tools, search
+
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "200"))
+
+
+def iter_notes(stream, fmt="jsonl", text_field="text"):
+    """
+    Yield the note text of every input record, or None for records that
+    can't be used, so record positions stay stable for checkpointing.
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            text = (row.get(text_field) or "").strip()
+            yield text or None
+        return
+
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        text = record.get(text_field) if isinstance(record, dict) else record
+        yield text.strip() if isinstance(text, str) and text.strip() else None
+
+
+def _read_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return 0
+    try:
+        with open(path, encoding="utf-8") as f:
+            return int(json.load(f).get("records_done", 0))
+    except Exception:
+        return 0
+
+
+def _write_checkpoint(path, records_done):
+    if not path:
+        return
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"records_done": records_done, "updated_at": time.time()}, f)
+    os.replace(tmp, path)
+
+
+def ingest(stream, fmt="jsonl", text_field="text", concurrency=None, chunk_size=None,
+           checkpoint_path=None, strategy=None, log=None):
+    """
+    Import every note from stream. Returns throughput stats.
+    With checkpoint_path set, records committed by a previous run are skipped.
+    """
+    concurrency = concurrency or INGEST_CONCURRENCY
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    log = log or (lambda msg: None)
+
+    done = _read_checkpoint(checkpoint_path)
+    notes = iter_notes(stream, fmt, text_field)
+    for _ in islice(notes, done):
+        pass
+
+    stats = {"resumed_from": done, "records": 0, "inserted": 0, "skipped": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    def extract(text):
+        return langgraph_tools.run_extraction(text, strategy=strategy)
+
+    db = SessionLocal()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ingest") as pool:
+            while True:
+                chunk = list(islice(notes, chunk_size))
+                if not chunk:
+                    break
+                texts = [t for t in chunk if t]
+                extracted = list(pool.map(extract, texts))
+                crud.bulk_create_interactions(db, zip(extracted, texts))
+
+                done += len(chunk)
+                _write_checkpoint(checkpoint_path, done)
+                stats["records"] += len(chunk)
+                stats["inserted"] += len(texts)
+                stats["skipped"] += len(chunk) - len(texts)
+                stats["chunks"] += 1
+                log(f"ingest: committed {done} records ({stats['inserted']} inserted this run)")
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["notes_per_s"] = round(stats["inserted"] / elapsed, 2) if elapsed else None
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import historical call notes.")
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default=None,
+                        help="defaults to the file extension, else jsonl")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--checkpoint", default=None, help="checkpoint file for resumable runs")
+    parser.add_argument("--strategy", choices=("per_tool", "combined"), default=None)
+    args = parser.parse_args(argv)
+
+    sync_schema(models.Base.metadata)
+    search.setup()
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    log = lambda msg: print(msg, file=sys.stderr)
+    if args.path == "-":
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+        stats = ingest(stream, fmt, args.text_field, args.concurrency, args.chunk_size,
+                       args.checkpoint, args.strategy, log)
+    else:
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            stats = ingest(stream, fmt, args.text_field, args.concurrency, args.chunk_size,
+                           args.checkpoint, args.strategy, log)
+    print(json.dumps(stats))
+    return stats
+
+
+if __name__ == "__main__":
+    main()
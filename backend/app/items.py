@@ -0,0 +1,237 @@
+"""
+Materials and samples as child rows (interaction_item)
+- parse(): "5 sample(s)", "3 x Product-X", "Product-X (2)", {"name": .., "quantity": ..}
+  (strengths like "10mg" and years like "2024 ..." are part of the name, not counts)
+  -> (item, product, quantity); sample strings without a product name pick it
+  up from the note itself ("5 samples of Product-X", "5 Product-X samples")
+- crud rewrites an interaction's rows in the same transaction as each write;
+  hcp_id and the interaction date are copied onto the rows so aggregations
+  are single-table index range scans
+- the JSON columns stay as the display copy returned by the API
+- setup() converts interactions that have items but no child rows yet
+
+CLI:  python -m app.items migrate [--reparse]
+"""
+
+import re
+import json
+import argparse
+from datetime import date
+from sqlalchemy import func, exists, or_, cast, Text
+from .models import Interaction, InteractionItem
+
+KINDS = {"materials_shared": "material", "samples_distributed": "sample"}
+
+_UNITS = r"(?:sample\(s\)|samples?|vials?|packs?|boxes|box|units?|pcs|pieces?|copies|copy)"
+# the number must stand alone ("3 x", "3x ", "3 ") so "3 xylitol" and "10mg" keep their letters
+_QTY_FIRST = re.compile(r"^\s*(\d+)(?:\s*(?:x(?=\s)|×)|(?=\s|$))\s*(.*)$", re.IGNORECASE)
+_QTY_LAST = re.compile(r"^(.*?\S)(?:\s+[x×]\s*|\s*\(\s*|\s+)(\d+)\s*\)?\s*$", re.IGNORECASE)
+_UNIT_WORDS = re.compile(rf"\b{_UNITS}(?=\W|$)", re.IGNORECASE)
+_DOSE_UNITS = re.compile(r"(?:mg|mcg|µg|ug|g|kg|ml|l|iu|mmol|%)(?![a-z])", re.IGNORECASE)
+_YEAR = re.compile(r"(?:19|20)\d\d")
+_PRODUCT = r"([A-Za-z][\w\-]*(?:\s+[A-Z0-9][\w\-]*)?)"
+
+
+def _clean(text):
+    text = _UNIT_WORDS.sub(" ", text or "")
+    text = re.sub(r"^\s*of\b", " ", text, flags=re.IGNORECASE)
+    text = re.sub(r"\s+", " ", text).strip(" -,:;.")
+    return text or None
+
+
+def _is_quantity(number, following=""):
+    """False for strengths ("10 mg") and years ("2024 Study Reprint") unless a count unit follows."""
+    if _DOSE_UNITS.match(following):
+        return False
+    return not (_YEAR.fullmatch(number) and not _UNIT_WORDS.match(following))
+
+
+def _product_from_note(quantity, raw_text):
+    if not raw_text or quantity is None:
+        return None
+    for pattern in (rf"\b{quantity}\s*{_UNITS}\s+of\s+{_PRODUCT}",
+                    rf"\b{quantity}\s+{_PRODUCT}\s+{_UNITS}\b"):
+        m = re.search(pattern, raw_text, re.IGNORECASE)
+        if m:
+            return _clean(m.group(1))
+    return None
+
+
+def parse(kind, value, raw_text=None):
+    """(item, product, quantity) for one list entry, or None when it's empty."""
+    if isinstance(value, dict):
+        name = value.get("product") or value.get("name") or value.get("item")
+        qty = value.get("quantity") or value.get("qty") or value.get("count")
+        item = str(name or json.dumps(value, sort_keys=True)).strip()
+        try:
+            quantity = max(1, int(qty))
+        except (TypeError, ValueError):
+            quantity = 1
+        return item, _clean(str(name)) if name else None, quantity
+
+    item = str(value or "").strip()
+    if not item:
+        return None
+    quantity, rest = None, item
+    m = _QTY_FIRST.match(item)
+    if m and _is_quantity(m.group(1), m.group(2)):
+        quantity, rest = int(m.group(1)), m.group(2)
+    else:
+        m = _QTY_LAST.match(item)
+        if m and _is_quantity(m.group(2)):
+            rest, quantity = m.group(1), int(m.group(2))
+    product = _clean(rest)
+    if product is None and kind == "sample":
+        product = _product_from_note(quantity, raw_text)
+    return item, product, quantity if quantity and quantity > 0 else 1
+
+
+def rows_for(fields):
+    """Child-row mappings for an Interaction or a dict of its columns."""
+    get = fields.get if isinstance(fields, dict) else (lambda k: getattr(fields, k, None))
+    interaction_id = get("id")
+    day = get("date")
+    if not isinstance(day, date):
+        created = get("created_at")
+        day = created.date() if created else None
+    rows = []
+    for column, kind in KINDS.items():
+        for value in get(column) or []:
+            parsed = parse(kind, value, get("raw_text"))
+            if parsed is None:
+                continue
+            item, product, quantity = parsed
+            rows.append(dict(
+                interaction_id=interaction_id, hcp_id=get("hcp_id"), date=day, kind=kind,
+                item=item[:500], product=product, product_key=product.lower() if product else None,
+                quantity=quantity,
+            ))
+    return rows
+
+
+def insert_for(db, fields_list):
+    """Insert child rows for freshly created interactions (no existing rows to replace)."""
+    rows = [r for fields in fields_list for r in rows_for(fields)]
+    if rows:
+        db.bulk_insert_mappings(InteractionItem, rows)
+
+
+def replace_for(db, obj):
+    """Rewrite one interaction's child rows from its current column values."""
+    db.query(InteractionItem).filter(InteractionItem.interaction_id == obj.id).delete(synchronize_session=False)
+    insert_for(db, [obj])
+
+
+# ---------------------------
+# Aggregation
+# ---------------------------
+def _month(column, dialect):
+    if dialect == "postgresql":
+        return func.to_char(column, "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def aggregate(db, kind=None, product=None, hcp_id=None, date_from=None, date_to=None,
+              group_by="product", limit=100):
+    """
+    Summed quantities and interaction counts, grouped by product, hcp or month.
+    Returns [{"key", "quantity", "interactions"}], largest quantity first.
+    """
+    if group_by == "hcp":
+        key = InteractionItem.hcp_id
+    elif group_by == "month":
+        key = _month(InteractionItem.date, db.get_bind().dialect.name)
+    else:
+        key = func.coalesce(InteractionItem.product_key, "")
+    q = db.query(
+        key.label("key"),
+        func.min(InteractionItem.product).label("label"),
+        func.sum(InteractionItem.quantity).label("quantity"),
+        func.count(func.distinct(InteractionItem.interaction_id)).label("interactions"),
+    )
+    if kind:
+        q = q.filter(InteractionItem.kind == kind)
+    if product:
+        q = q.filter(InteractionItem.product_key == product.strip().lower())
+    if hcp_id:
+        q = q.filter(InteractionItem.hcp_id == hcp_id)
+    if date_from:
+        q = q.filter(InteractionItem.date >= date_from)
+    if date_to:
+        q = q.filter(InteractionItem.date <= date_to)
+    rows = q.group_by(key).order_by(func.sum(InteractionItem.quantity).desc()).limit(limit).all()
+    return [
+        {
+            "key": (r.label if group_by == "product" else r.key) or None,
+            "quantity": int(r.quantity or 0),
+            "interactions": r.interactions,
+        }
+        for r in rows
+    ]
+
+
+# ---------------------------
+# Migration of existing rows
+# ---------------------------
+def migrate(db, batch_size=500, log=None, reparse=False):
+    """
+    Create child rows for interactions that have none yet; with reparse, rewrite
+    existing rows too (after parse() changes). Returns interactions converted.
+    """
+    converted, last_id = 0, ""
+    filters = [or_(*(cast(getattr(Interaction, c), Text).notin_(("[]", "null")) for c in KINDS))]
+    if not reparse:
+        filters.append(~exists().where(InteractionItem.interaction_id == Interaction.id))
+    while True:
+        batch = (db.query(Interaction)
+                 .filter(Interaction.id > last_id, *filters)
+                 .order_by(Interaction.id).limit(batch_size).all())
+        if not batch:
+            break
+        last_id = batch[-1].id
+        todo = [o for o in batch if o.materials_shared or o.samples_distributed]
+        if reparse:
+            (db.query(InteractionItem).filter(InteractionItem.interaction_id.in_([o.id for o in batch]))
+             .delete(synchronize_session=False))
+        insert_for(db, todo)
+        db.commit()
+        db.expunge_all()
+        converted += len(todo)
+        if log:
+            log(f"items: converted {converted} interactions (last id {last_id})")
+    return converted
+
+
+def setup():
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        return migrate(db)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    import sys
+    from .database import SessionLocal, sync_schema
+    from . import models
+
+    parser = argparse.ArgumentParser(description="Convert materials/samples JSON into interaction_item rows.")
+    parser.add_argument("command", choices=("migrate",))
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--reparse", action="store_true", help="rewrite existing rows with the current parser")
+    args = parser.parse_args(argv)
+
+    sync_schema(models.Base.metadata)
+    db = SessionLocal()
+    try:
+        converted = migrate(db, batch_size=args.batch_size, reparse=args.reparse,
+                            log=lambda msg: print(msg, file=sys.stderr))
+    finally:
+        db.close()
+    print(json.dumps({"command": args.command, "interactions": converted}))
+    return converted
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+In-process job queue for asynchronous interaction logging
+- The Interaction row itself is the durable queue entry (status pending -> running -> done|failed)
+- A bounded worker pool (JOB_WORKERS) runs run_extraction and fills in the row
+- A worker claims a row with one conditional UPDATE, so with several processes
+  (uvicorn --workers N) each job runs once; a claim is a lease of JOB_LEASE_SECONDS
+- On startup pending rows and running rows whose lease ran out are re-queued,
+  so a restart never loses a job and never repeats one a sibling is still running
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .database import SessionLocal
+from . import crud, langgraph_tools
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))   # longer than any extraction
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="interaction-job")
+        return _pool
+
+def submit(interaction_id):
+    return _get_pool().submit(process_interaction, interaction_id)
+
+def process_interaction(interaction_id):
+    db = SessionLocal()
+    claimed = False
+    try:
+        claimed = crud.claim_interaction(db, interaction_id, JOB_LEASE_SECONDS)
+        if not claimed:
+            return      # finished, gone, or running in another worker
+        obj = crud.get_interaction(db, interaction_id)
+        extracted = langgraph_tools.run_extraction(obj.raw_text or "")
+        crud.update_interaction(db, interaction_id, dict(extracted, status="done"))
+    except Exception as e:
+        langgraph_tools._log(f"job {interaction_id} failed: {repr(e)}", logging.ERROR)
+        if claimed:
+            try:
+                crud.fail_interaction(db, interaction_id, repr(e))
+            except Exception as e2:
+                # the lease runs out and a later startup retries it
+                langgraph_tools._log(f"job {interaction_id} not marked failed: {repr(e2)}", logging.ERROR)
+    finally:
+        db.close()
+
+def recover_unfinished():
+    """Re-queue pending rows and running rows whose lease expired (left by a dead process)."""
+    db = SessionLocal()
+    try:
+        ids = crud.get_unfinished_interaction_ids(db, JOB_LEASE_SECONDS)
+    finally:
+        db.close()
+    for interaction_id in ids:
+        submit(interaction_id)
+    return len(ids)
+
+def shutdown():
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
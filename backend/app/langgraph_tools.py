@@ -9,66 +9,274 @@ Defensive LangGraph Tools (Groq LLM Powered)
 import os
 import re
 import json
-import requests
+import logging
+import functools
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import (ThreadPoolExecutor, Future, wait, as_completed, FIRST_COMPLETED,
+                                TimeoutError as FuturesTimeout)
 from datetime import datetime
 from dotenv import load_dotenv
+from . import llm_cache, groq_client, rules, logs, metrics, prompts, sentiment_model
 
 load_dotenv()
 
 GROQ_API_URL = os.getenv("GROQ_API_URL")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-DEBUG_LOG_PATH = os.path.join(os.path.dirname(__file__), "langgraph_debug.log")
+# small model for the extractors whose answer is a short span or label
+GROQ_FAST_MODEL = os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
 
-def _log(msg):
+def _tool_models():
+    models = {t: GROQ_FAST_MODEL for t in ("hcp_name", "date", "time", "sentiment", "route")}
+    models.update({t: MODEL for t in ("materials", "summary", "combined")})
+    # TOOL_MODELS="time=llama-3.1-8b-instant,summary=llama-3.3-70b-versatile"
+    for part in os.getenv("TOOL_MODELS", "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() and value.strip():
+            models[name.strip()] = value.strip()
+    return models
+
+TOOL_MODELS = _tool_models()
+
+# Hedged requests: when a call is still running after the model's recent
+# GROQ_HEDGE_PERCENTILE latency (GROQ_HEDGE_AFTER_MS until enough samples),
+# send a duplicate to GROQ_HEDGE_MODEL / GROQ_HEDGE_API_URL and use whichever
+# answers first. The slower call is left to finish and its answer discarded.
+# The primary starts at once on its own thread (the delay never includes
+# queueing); hedges are capped at GROQ_HEDGE_MAX_RATIO of calls and
+# GROQ_HEDGE_WORKERS in flight, and are skipped rather than queued.
+GROQ_HEDGE = os.getenv("GROQ_HEDGE", "false").lower() in ("1", "true", "yes")
+GROQ_HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "0.95"))   # 0 = fixed delay only
+GROQ_HEDGE_AFTER_MS = float(os.getenv("GROQ_HEDGE_AFTER_MS", "1500"))
+GROQ_HEDGE_MIN_SAMPLES = int(os.getenv("GROQ_HEDGE_MIN_SAMPLES", "20"))
+GROQ_HEDGE_MODEL = os.getenv("GROQ_HEDGE_MODEL")            # default: same model
+GROQ_HEDGE_API_URL = os.getenv("GROQ_HEDGE_API_URL")        # default: GROQ_API_URL
+GROQ_HEDGE_API_KEY = os.getenv("GROQ_HEDGE_API_KEY")        # default: GROQ_API_KEY
+GROQ_HEDGE_WORKERS = int(os.getenv("GROQ_HEDGE_WORKERS", "8"))         # hedges in flight at once
+GROQ_HEDGE_MAX_RATIO = float(os.getenv("GROQ_HEDGE_MAX_RATIO", "0.05"))  # hedges per Groq call, long-run
+
+logger = logs.get_logger("langgraph")
+
+def _log(msg, level=logging.INFO, **fields):
+    """Enqueue a JSON-lines record (written by the logs background thread)."""
     try:
-        with open(DEBUG_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(f"{datetime.now().isoformat()}   {msg}\n")
+        logger.log(level, msg, extra={"fields": fields} if fields else None)
     except Exception:
         pass  # never crash for logging
 
 if not GROQ_API_KEY or not GROQ_API_URL:
-    _log("ERROR: GROQ_API_URL or GROQ_API_KEY missing from environment")
+    _log("ERROR: GROQ_API_URL or GROQ_API_KEY missing from environment", logging.WARNING)
     # don't raise here — we return graceful errors later
 
 # ---------------------------
 # Groq API wrapper (defensive)
 # ---------------------------
-def groq_call(messages, max_tokens=400, temperature=0.0, timeout=30):
+def groq_call(messages, max_tokens=400, temperature=0.0, timeout=30, response_format=None, model=None):
     """
     Safe wrapper around Groq endpoint.
     Returns: assistant text on success (string) or None on failure.
+    Deterministic calls (temperature 0) are served from llm_cache when possible.
+    response_format (e.g. {"type": "json_object"}) is passed through and is part of the cache key.
+    model defaults to GROQ_MODEL; with GROQ_HEDGE on, slow calls are hedged.
     Logs request+response to langgraph_debug.log
     """
-    if not GROQ_API_KEY or not GROQ_API_URL:
-        _log("groq_call aborted: missing API_URL or API_KEY")
+    model = model or MODEL
+    cacheable = llm_cache.LLM_CACHE_ENABLED and not temperature
+    key = None
+    if cacheable:
+        try:
+            extra = {"response_format": response_format} if response_format else {}
+            key = llm_cache.make_key(model, messages, max_tokens, temperature, **extra)
+            cached = llm_cache.get_cache().get(key)
+            if cached is not None:
+                _log("GROQ CACHE HIT", logging.DEBUG, key=key[:16])
+                return cached
+        except Exception as e:
+            _log(f"GROQ CACHE READ ERROR: {repr(e)}", logging.WARNING)
+            key = None
+
+    if GROQ_HEDGE:
+        # a hedge answer is cached under the requested model's key: either answer serves the call
+        content = _hedged_request(messages, max_tokens, temperature, timeout, response_format, model)
+    else:
+        content = _groq_request(messages, max_tokens, temperature, timeout, response_format, model)
+
+    if key is not None and content is not None:
+        try:
+            llm_cache.get_cache().set(key, content)
+        except Exception as e:
+            _log(f"GROQ CACHE WRITE ERROR: {repr(e)}", logging.WARNING)
+    return content
+
+class _Latencies:
+    """Recent successful round-trip times per model, for the hedge delay."""
+
+    def __init__(self, size=256):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._size = size
+
+    def add(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self._size)).append(seconds)
+
+    def percentile(self, model, q):
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < GROQ_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+class _HedgeBudget:
+    """Token bucket: every call earns GROQ_HEDGE_MAX_RATIO of a hedge, a hedge spends one."""
+
+    def __init__(self, ratio, burst=5.0):
+        self._lock = threading.Lock()
+        self._ratio = ratio
+        self._burst = max(1.0, burst)
+        self._tokens = 1.0
+
+    def earn(self):
+        with self._lock:
+            self._tokens = min(self._burst, self._tokens + self._ratio)
+
+    def spend(self):
+        with self._lock:
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+_latencies = _Latencies()
+_hedge_budget = _HedgeBudget(GROQ_HEDGE_MAX_RATIO)
+_hedge_slots = threading.BoundedSemaphore(max(1, GROQ_HEDGE_WORKERS))
+_hedge_pool = None
+_hedge_pool_lock = threading.Lock()
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _hedge_pool_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=max(1, GROQ_HEDGE_WORKERS), thread_name_prefix="groq-hedge")
+        return _hedge_pool
+
+def _hedge_delay(model):
+    if GROQ_HEDGE_PERCENTILE > 0:
+        observed = _latencies.percentile(model, GROQ_HEDGE_PERCENTILE)
+        if observed is not None:
+            return observed
+    return GROQ_HEDGE_AFTER_MS / 1000.0
+
+def _start_primary(*args):
+    """Run _groq_request on a thread of its own, started now, so it never waits in a queue."""
+    future = Future()
+    ctx = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(ctx.run(_groq_request, *args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="groq-primary", daemon=True).start()
+    return future
+
+def _hedged_request(messages, max_tokens, temperature, timeout, response_format, model):
+    primary = _start_primary(messages, max_tokens, temperature, timeout, response_format, model)
+    _hedge_budget.earn()
+    try:
+        return primary.result(timeout=_hedge_delay(model))
+    except FuturesTimeout:
+        pass
+
+    if not _hedge_slots.acquire(blocking=False):
+        metrics.GROQ_HEDGES.inc(outcome="skipped_busy")
+        return primary.result()
+    if not _hedge_budget.spend():
+        _hedge_slots.release()
+        metrics.GROQ_HEDGES.inc(outcome="skipped_budget")
+        return primary.result()
+
+    hedge_model = GROQ_HEDGE_MODEL or model
+    _log("GROQ HEDGE", logging.DEBUG, model=model, hedge_model=hedge_model)
+    metrics.GROQ_HEDGES.inc(outcome="fired")
+    hedge = _get_hedge_pool().submit(contextvars.copy_context().run, _groq_request,
+                                     messages, max_tokens, temperature, timeout, response_format, hedge_model,
+                                     GROQ_HEDGE_API_URL, GROQ_HEDGE_API_KEY)
+    hedge.add_done_callback(lambda _f: _hedge_slots.release())
+    pending = {primary: "primary", hedge: "hedge"}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            label = pending.pop(future)
+            try:
+                content = future.result()
+            except Exception:
+                content = None
+            if content is not None:
+                metrics.GROQ_HEDGES.inc(outcome=f"{label}_won")
+                return content
+    return None
+
+def _groq_request(messages, max_tokens, temperature, timeout, response_format=None, model=None,
+                  url=None, api_key=None):
+    model = model or MODEL
+    url = url or GROQ_API_URL
+    api_key = api_key or GROQ_API_KEY
+    if not api_key or not url:
+        _log("groq_call aborted: missing API_URL or API_KEY", logging.WARNING)
+        metrics.GROQ_NONE.inc(reason="not_configured")
         return None
 
     headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
     payload = {
-        "model": MODEL,
+        "model": model,
         "messages": messages,
         "max_tokens": max_tokens,
         "temperature": temperature,
     }
+    if response_format:
+        payload["response_format"] = response_format
 
     try:
-        _log("GROQ REQUEST -> " + json.dumps({"url": GROQ_API_URL, "payload_preview": payload}, default=str))
-        resp = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=timeout)
+        capture = logs.sample_payload(logger)
+        if capture:
+            _log("GROQ REQUEST", logging.DEBUG, url=url, payload=payload)
+        started = time.monotonic()
+        with metrics.GROQ_SECONDS.time(model=model):
+            resp = groq_client.get_client().post(url, headers, payload, timeout=timeout, log=_log)
+        if resp.status_code < 400:
+            _latencies.add(model, time.monotonic() - started)
     except Exception as e:
-        _log(f"GROQ CALL EXCEPTION: {repr(e)}")
+        _log(f"GROQ CALL EXCEPTION: {repr(e)}", logging.WARNING)
+        metrics.GROQ_RESPONSES.inc(status="error")
+        metrics.GROQ_NONE.inc(reason="exception")
         return None
+    metrics.GROQ_RESPONSES.inc(status=resp.status_code)
 
     try:
         body = resp.json()
     except Exception as e:
-        _log(f"GROQ NON-JSON RESPONSE STATUS {resp.status_code}: {resp.text[:1000]!s}")
+        _log("GROQ NON-JSON RESPONSE", logging.WARNING, status=resp.status_code, body=resp.text[:1000])
+        metrics.GROQ_NONE.inc(reason="non_json")
         return None
 
-    _log(f"GROQ RESPONSE STATUS {resp.status_code} -> {json.dumps(body)[:4000]}")
+    usage = body.get("usage") if isinstance(body, dict) else None
+    if isinstance(usage, dict):
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if isinstance(usage.get(kind), (int, float)):
+                metrics.GROQ_TOKENS.inc(usage[kind], model=model, kind=kind.split("_")[0])
+
+    _log("GROQ RESPONSE", logging.INFO if resp.status_code < 400 else logging.WARNING,
+         status=resp.status_code, model=body.get("model") if isinstance(body, dict) else None)
+    if capture:
+        _log("GROQ RESPONSE BODY", logging.DEBUG, status=resp.status_code, body=json.dumps(body)[:4000])
     # Try to read choices[0].message.content
     try:
         return body["choices"][0]["message"]["content"]
@@ -76,7 +284,8 @@ def groq_call(messages, max_tokens=400, temperature=0.0, timeout=30):
         # If groq returns plain text at top-level
         if isinstance(body, dict) and "content" in body:
             return body.get("content")
-        _log(f"GROQ PARSE ERROR: {repr(e)} -- body keys: {list(body.keys())}")
+        _log(f"GROQ PARSE ERROR: {repr(e)} -- body keys: {list(body.keys())}", logging.WARNING)
+        metrics.GROQ_NONE.inc(reason="parse_error")
         return None
 
 # ---------------------------
@@ -85,6 +294,9 @@ def groq_call(messages, max_tokens=400, temperature=0.0, timeout=30):
 def normalize_date(date_text):
     if not date_text:
         return None
+    fast = rules.parse_date(date_text)
+    if fast:
+        return fast
     dt = str(date_text).strip().lower()
     dt = re.sub(r"(\d+)(st|nd|rd|th)", r"\1", dt)
     dt = dt.replace("/", "-").replace(",", "")
@@ -145,32 +357,45 @@ def _safe_json_load(text):
             except:
                 pass
     return None
+def _ask(tool, system, text):
+    """One budgeted prompt (prompts.build) sent to the tool's model (TOOL_MODELS)."""
+    prompt, opts = prompts.build(tool, system, text)
+    return groq_call(prompt, model=TOOL_MODELS.get(tool, MODEL), **opts)
+
+def _counts_fallback(field):
+    """Count every time an extractor ends up on its non-LLM fallback."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(text):
+            metrics.TOOL_FALLBACKS.inc(tool=field)
+            return fn(text)
+        return wrapper
+    return decorate
+
 #Extract “Dr. Smith”, “Prof. Rao”, etc.
 def extract_hcp_name(text):
-    prompt = [
-        {"role": "system", "content": "Extract HCP name. Return ONLY JSON with key 'hcp_name'."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    resp = _ask("hcp_name", "Extract HCP name. Return ONLY JSON with key 'hcp_name'.", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed and "hcp_name" in parsed:
             return {"hcp_name": parsed.get("hcp_name")}
-    # fallback regex
+    return _fallback_hcp_name(text)
+
+@_counts_fallback("hcp_name")
+def _fallback_hcp_name(text):
     m = re.search(r"\b(dr\.?\s+[A-Z][a-zA-Z\-\']+|prof\.?\s+[A-Z][a-zA-Z\-\']+)\b", text, re.IGNORECASE)
     return {"hcp_name": m.group(0).strip() if m else None}
 #Find and normalize dates into YYYY-MM-DD
 def extract_date(text):
-    prompt = [
-        {"role": "system", "content": "Extract the date and return ONLY JSON {\"date\":\"...\"} or {\"date\": null}."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    resp = _ask("date", "Extract the date and return ONLY JSON {\"date\":\"...\"} or {\"date\": null}.", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed and "date" in parsed:
             return {"date": normalize_date(parsed.get("date"))}
-    # fallback regex
+    return _fallback_date(text)
+
+@_counts_fallback("date")
+def _fallback_date(text):
     m = re.search(r"\b(\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})\b", text, re.IGNORECASE)
     if m:
         return {"date": normalize_date(m.group(0))}
@@ -180,16 +405,15 @@ def extract_date(text):
     return {"date": None}
 #Detect times and convert into HH:MM
 def extract_time(text):
-    prompt = [
-        {"role": "system", "content": "Extract time, return ONLY JSON {\"time\":\"...\"} or null."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    resp = _ask("time", "Extract time, return ONLY JSON {\"time\":\"...\"} or null.", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed and "time" in parsed:
             return {"time": normalize_time(parsed.get("time"))}
-    # fallback regex
+    return _fallback_time(text)
+
+@_counts_fallback("time")
+def _fallback_time(text):
     m = re.search(r"\b([01]?\d|2[0-3]):([0-5]\d)\b", text)
     if m:
         return {"time": normalize_time(m.group(0))}
@@ -199,42 +423,49 @@ def extract_time(text):
     return {"time": None}
 #Detect sentiment (Positive, Neutral, Negative).
 def extract_sentiment(text):
-    # quick keyword rules
-    if re.search(r"\b(observed\/inferred\s+hcp\s+sentiment\s*[:\-]?\s*(positive|negative|neutral))", text, re.IGNORECASE):
-        m = re.search(r"(positive|negative|neutral)", text, re.IGNORECASE)
-        if m:
-            val = m.group(1).capitalize()
-            return {"sentiment": val, "sentiment_source": "observed"}
-    if re.search(r"\b(positive|liked|interested|good|favourable|favorable)\b", text, re.IGNORECASE):
-        return {"sentiment": "Positive", "sentiment_source": "inferred"}
-    if re.search(r"\b(negative|not interested|did not|disliked|no interest)\b", text, re.IGNORECASE):
-        return {"sentiment": "Negative", "sentiment_source": "inferred"}
-    if re.search(r"\bneutral\b", text, re.IGNORECASE):
-        return {"sentiment": "Neutral", "sentiment_source": "inferred"}
-
-    # LLM fallback
-    prompt = [
-        {"role": "system", "content": "Classify as Positive, Neutral or Negative. Return ONLY JSON {\"sentiment\":\"...\"}."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    local = _sentiment_local(text)
+    if local:
+        return local
+
+    # LLM fallback (nothing on-box was confident)
+    resp = _ask("sentiment", "Classify as Positive, Neutral or Negative. Return ONLY JSON {\"sentiment\":\"...\"}.", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed and "sentiment" in parsed:
-            s = parsed.get("sentiment")
-            if s:
-                ss = s.strip().lower()
-                if "pos" in ss: return {"sentiment": "Positive", "sentiment_source": "inferred"}
-                if "neg" in ss: return {"sentiment": "Negative", "sentiment_source": "inferred"}
-                if "neu" in ss: return {"sentiment": "Neutral", "sentiment_source": "inferred"}
+            label = _sentiment_label(parsed.get("sentiment"))
+            if label:
+                return {"sentiment": label, "sentiment_source": "inferred"}
     return {"sentiment": None, "sentiment_source": None}
+
+def _sentiment_local(text):
+    """
+    On-box sentiment, or None to ask the LLM: an explicit label in the note
+    first, then the local classifier. When a classifier is loaded but unsure,
+    the LLM decides; without one, the negation-aware keyword rules answer.
+    """
+    ruled, source = rules.sentiment(text or "")
+    if ruled.value and ruled.confidence >= RULES_CONFIDENCE_THRESHOLD:
+        return {"sentiment": ruled.value, "sentiment_source": source}
+    if sentiment_model.get_model() is not None:
+        predicted = sentiment_model.predict(text)
+        if predicted:
+            return {"sentiment": predicted[0], "sentiment_source": "inferred"}
+        return None
+    if ruled.value:
+        return {"sentiment": ruled.value, "sentiment_source": source}
+    return None
+
+def _sentiment_label(s):
+    if not s or not isinstance(s, str):
+        return None
+    ss = s.strip().lower()
+    if "pos" in ss: return "Positive"
+    if "neg" in ss: return "Negative"
+    if "neu" in ss: return "Neutral"
+    return None
 #Extract brochures, samples, topics discussed.
 def extract_materials_and_topics(text):
-    prompt = [
-        {"role": "system", "content": "Return JSON with keys: materials_shared (array), samples_distributed (array), topics_discussed (string|null)."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    resp = _ask("materials", "Return JSON with keys: materials_shared (array), samples_distributed (array), topics_discussed (string|null).", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed:
@@ -243,7 +474,10 @@ def extract_materials_and_topics(text):
                 "samples_distributed": parsed.get("samples_distributed") or [],
                 "topics_discussed": parsed.get("topics_discussed")
             }
-    # fallback simple heuristics
+    return _fallback_materials_and_topics(text)
+
+@_counts_fallback("materials_and_topics")
+def _fallback_materials_and_topics(text):
     mats = []
     if re.search(r"\bbrochure\b", text, re.IGNORECASE): mats.append("Brochure")
     if re.search(r"\bleaflet\b", text, re.IGNORECASE): mats.append("Leaflet")
@@ -256,76 +490,313 @@ def extract_materials_and_topics(text):
     return {"materials_shared": mats, "samples_distributed": samples, "topics_discussed": topics}
 #Generate a 1–2 line structured summary.
 def summarize_interaction(text):
-    prompt = [
-        {"role": "system", "content": "Summarize interaction in 1-2 sentences. Return JSON {\"summary\":\"...\"} only."},
-        {"role": "user", "content": text}
-    ]
-    resp = groq_call(prompt)
+    resp = _ask("summary", "Summarize interaction in 1-2 sentences. Return JSON {\"summary\":\"...\"} only.", text)
     if resp:
         parsed = _safe_json_load(resp)
         if parsed and "summary" in parsed:
             return {"summary": parsed.get("summary")}
-    # fallback: first sentence
+    return _fallback_summary(text)
+
+@_counts_fallback("summary")
+def _fallback_summary(text):
+    # first sentence
     s = re.split(r"[.\n]", text.strip())
     return {"summary": s[0].strip() if s and s[0].strip() else text[:200]}
 
+#Extract every field with a single LLM call; regex fallbacks only fill the gaps.
+COMBINED_SYSTEM_PROMPT = (
+    "Extract the HCP interaction details. Return ONLY one JSON object with keys: "
+    "hcp_name (string|null), date (string|null), time (string|null), "
+    "sentiment (\"Positive\"|\"Neutral\"|\"Negative\"|null), materials_shared (array of strings), "
+    "samples_distributed (array of strings), topics_discussed (string|null), "
+    "summary (1-2 sentence string)."
+)
+
+def _as_str_list(value):
+    if isinstance(value, list):
+        return [str(v) for v in value if v]
+    if isinstance(value, str) and value.strip():
+        return [value.strip()]
+    return None
+
+def extract_combined(text):
+    resp = _ask("combined", COMBINED_SYSTEM_PROMPT, text)
+    parsed = _safe_json_load(resp) if resp else None
+    if not isinstance(parsed, dict):
+        parsed = {}
+
+    out = empty_output()
+
+    name = parsed.get("hcp_name")
+    if isinstance(name, str) and name.strip():
+        out["hcp_name"] = name.strip()
+    else:
+        out.update(_fallback_hcp_name(text))
+
+    out["date"] = normalize_date(parsed.get("date")) or _fallback_date(text)["date"]
+    out["time"] = normalize_time(parsed.get("time")) or _fallback_time(text)["time"]
+
+    # on-box sentiment takes precedence exactly as in extract_sentiment
+    ruled = _sentiment_local(text)
+    if ruled:
+        out.update(ruled)
+    else:
+        label = _sentiment_label(parsed.get("sentiment"))
+        if label:
+            out["sentiment"], out["sentiment_source"] = label, "inferred"
+
+    materials = _as_str_list(parsed.get("materials_shared"))
+    samples = _as_str_list(parsed.get("samples_distributed"))
+    topics = parsed.get("topics_discussed")
+    if not isinstance(topics, str) or not topics.strip():
+        topics = None
+    if materials is None or samples is None or topics is None:
+        heuristics = _fallback_materials_and_topics(text)
+        materials = heuristics["materials_shared"] if materials is None else materials
+        samples = heuristics["samples_distributed"] if samples is None else samples
+        topics = heuristics["topics_discussed"] if topics is None else topics
+    out["materials_shared"], out["samples_distributed"], out["topics_discussed"] = materials, samples, topics
+
+    summary = parsed.get("summary")
+    if isinstance(summary, str) and summary.strip():
+        out["summary"] = summary.strip()
+    else:
+        out.update(_fallback_summary(text))
+
+    return out
+
 # ---------------------------
 # Combined extraction pipeline (never raises)
 # ---------------------------
-def run_extraction(text):
-    try:
-        out = {
-            "hcp_name": None, "date": None, "time": None,
-            "topics_discussed": None, "materials_shared": [], "samples_distributed": [],
-            "sentiment": None, "sentiment_source": None, "summary": None
-        }
+# EXTRACTION_STRATEGY picks how fields are obtained: "per_tool" runs the six
+# field-specific tools, "combined" asks for every field in one prompt.
+EXTRACTION_STRATEGY = os.getenv("EXTRACTION_STRATEGY", "per_tool").lower()
 
-        try:
-            out.update(extract_hcp_name(text))
-        except Exception as e:
-            _log(f"extract_hcp_name error: {repr(e)}")
+# "sequential" runs the tools one after another; "concurrent" fans them out
+# on a thread pool shared by all requests and gives up on whatever has not
+# finished EXTRACTION_DEADLINE seconds after submission, queued or running.
+# The tools only wait on Groq, so the pool is sized for several requests'
+# worth of tools at once (4 x 6 by default) to keep them from queueing.
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "sequential").lower()
+EXTRACTION_MAX_WORKERS = int(os.getenv("EXTRACTION_MAX_WORKERS", "24"))
+EXTRACTION_DEADLINE = float(os.getenv("EXTRACTION_DEADLINE", "20"))  # seconds per request
 
-        try:
-            out.update(extract_date(text))
-        except Exception as e:
-            _log(f"extract_date error: {repr(e)}")
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
 
-        try:
-            out.update(extract_time(text))
-        except Exception as e:
-            _log(f"extract_time error: {repr(e)}")
+def _get_extraction_pool():
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            _extraction_pool = ThreadPoolExecutor(
+                max_workers=EXTRACTION_MAX_WORKERS, thread_name_prefix="extract"
+            )
+        return _extraction_pool
+
+def empty_output(text=None):
+    return {
+        "hcp_name": None, "date": None, "time": None,
+        "topics_discussed": None, "materials_shared": [], "samples_distributed": [],
+        "sentiment": None, "sentiment_source": None,
+        "summary": text[:200] if text is not None else None
+    }
 
+def _merge_update(out, result):
+    out.update(result)
+
+def _merge_sentiment(out, result):
+    out["sentiment"] = result.get("sentiment")
+    out["sentiment_source"] = result.get("sentiment_source")
+
+def _merge_materials(out, result):
+    out["materials_shared"] = result.get("materials_shared") or []
+    out["samples_distributed"] = result.get("samples_distributed") or []
+    out["topics_discussed"] = result.get("topics_discussed")
+
+def _merge_summary(out, result):
+    out["summary"] = result.get("summary")
+
+def _tool_failed(out, name, text):
+    # summary is the only field with a non-empty default when its tool fails
+    if name == "summarize_interaction":
+        out["summary"] = text[:200]
+
+# (name, tool, merge) — the order is the merge order in every mode
+EXTRACTION_TOOLS = [
+    ("extract_hcp_name", extract_hcp_name, _merge_update),
+    ("extract_date", extract_date, _merge_update),
+    ("extract_time", extract_time, _merge_update),
+    ("extract_sentiment", extract_sentiment, _merge_sentiment),
+    ("extract_materials_and_topics", extract_materials_and_topics, _merge_materials),
+    ("summarize_interaction", summarize_interaction, _merge_summary),
+]
+
+def _call_tool(name, fn, text):
+    # submitted via copy_context().run so spans in pool threads keep the request's trace id
+    with metrics.span(name), metrics.TOOL_SECONDS.time(tool=name):
+        return fn(text)
+
+def _run_sequential(text, out, tools=EXTRACTION_TOOLS):
+    for name, fn, merge in tools:
         try:
-            s = extract_sentiment(text)
-            out["sentiment"] = s.get("sentiment")
-            out["sentiment_source"] = s.get("sentiment_source")
+            merge(out, _call_tool(name, fn, text))
         except Exception as e:
-            _log(f"extract_sentiment error: {repr(e)}")
+            _log(f"{name} error: {repr(e)}", logging.WARNING)
+            _tool_failed(out, name, text)
+
+def _submit_tools(text, tools):
+    """{future: (name, merge)} for each tool, submitted to the shared pool."""
+    pool = _get_extraction_pool()
+    return {pool.submit(contextvars.copy_context().run, _call_tool, name, fn, text): (name, merge)
+            for name, fn, merge in tools}
 
+def _wait_tools(futures, deadline):
+    """
+    Yield (future, timed_out) as tools finish, fastest first. Whatever is still
+    pending deadline seconds after the call is cancelled (if still queued) and
+    counted in EXTRACTION_TIMEOUTS by stage, so queueing shows up separately.
+    """
+    pending = set(futures)
+    try:
+        for fut in as_completed(futures, timeout=deadline):
+            pending.discard(fut)
+            yield fut, False
+    except FuturesTimeout:
+        for fut in pending:
+            name = futures[fut][0]
+            stage = "queued" if fut.cancel() else "running"
+            metrics.EXTRACTION_TIMEOUTS.inc(tool=name, stage=stage)
+            _log(f"{name} timed out ({stage}) after {deadline}s deadline", logging.WARNING)
+            yield fut, True
+
+def _run_concurrent(text, out, deadline, tools=EXTRACTION_TOOLS):
+    futures = _submit_tools(text, tools)
+    results = {fut: None for fut in futures}
+    for fut, timed_out in _wait_tools(futures, deadline):
+        results[fut] = timed_out
+
+    # merge in declaration order so the output matches sequential mode
+    for fut, (name, merge) in futures.items():
+        if results[fut]:
+            _tool_failed(out, name, text)
+            continue
         try:
-            m = extract_materials_and_topics(text)
-            out["materials_shared"] = m.get("materials_shared") or []
-            out["samples_distributed"] = m.get("samples_distributed") or []
-            out["topics_discussed"] = m.get("topics_discussed")
+            merge(out, fut.result())
         except Exception as e:
-            _log(f"extract_materials_and_topics error: {repr(e)}")
+            _log(f"{name} error: {repr(e)}", logging.WARNING)
+            _tool_failed(out, name, text)
+
+# output keys each tool owns, used when streaming per-tool results
+TOOL_FIELDS = {
+    "extract_hcp_name": ("hcp_name",),
+    "extract_date": ("date",),
+    "extract_time": ("time",),
+    "extract_sentiment": ("sentiment", "sentiment_source"),
+    "extract_materials_and_topics": ("materials_shared", "samples_distributed", "topics_discussed"),
+    "summarize_interaction": ("summary",),
+}
 
+def _tool_fields(name, merge, result, text):
+    out = empty_output()
+    if result is None:
+        _tool_failed(out, name, text)
+    else:
+        merge(out, result)
+    return {k: out[k] for k in TOOL_FIELDS[name]}
+
+# Rules fast path: a tool is skipped when rules.extract resolved every field it
+# owns at or above this confidence. Set above 1 to always call the tools.
+RULES_CONFIDENCE_THRESHOLD = float(os.getenv("RULES_CONFIDENCE_THRESHOLD", "0.9"))
+
+def _rules_pass(text, threshold=None):
+    """(fields resolved by rules, EXTRACTION_TOOLS entries that still need to run)"""
+    threshold = RULES_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    if threshold > 1:
+        return {}, EXTRACTION_TOOLS
+    try:
+        ruled = rules.extract(text)
+    except Exception as e:
+        _log(f"rules.extract error: {repr(e)}", logging.WARNING)
+        return {}, EXTRACTION_TOOLS
+
+    resolved, remaining = {}, []
+    for entry in EXTRACTION_TOOLS:
+        fields = TOOL_FIELDS[entry[0]]
+        if all(ruled[f].confidence >= threshold for f in fields):
+            resolved.update({f: ruled[f].value for f in fields})
+        else:
+            remaining.append(entry)
+    return resolved, remaining
+
+def _combined_with_rules(text, resolved, remaining):
+    if not remaining:
+        return dict(resolved)
+    out = _call_tool("extract_combined", extract_combined, text)
+    out.update(resolved)
+    return out
+
+def iter_extraction(text, deadline=None, strategy=None, rules_threshold=None):
+    """
+    Yield (tool_name, fields) as each tool finishes, fastest first, so callers
+    can stream partial results. Rule-resolved fields come first as "rules";
+    remaining tools run concurrently; failed or late tools yield their default
+    fields. Never raises.
+    """
+    strategy = (strategy or EXTRACTION_STRATEGY).lower()
+    deadline = EXTRACTION_DEADLINE if deadline is None else deadline
+    resolved, remaining = _rules_pass(text, rules_threshold)
+
+    if strategy == "combined":
         try:
-            out["summary"] = summarize_interaction(text).get("summary")
+            yield "extract_combined", _combined_with_rules(text, resolved, remaining)
         except Exception as e:
-            _log(f"summarize_interaction error: {repr(e)}")
-            out["summary"] = text[:200]
+            _log(f"extract_combined error: {repr(e)}", logging.WARNING)
+            yield "extract_combined", empty_output(text)
+        return
+
+    if resolved:
+        yield "rules", resolved
+
+    futures = _submit_tools(text, remaining)
+    for fut, timed_out in _wait_tools(futures, deadline):
+        name, merge = futures[fut]
+        result = None
+        if not timed_out:
+            try:
+                result = fut.result()
+            except Exception as e:
+                _log(f"{name} error: {repr(e)}", logging.WARNING)
+        yield name, _tool_fields(name, merge, result, text)
+
+def run_extraction(text, mode=None, deadline=None, strategy=None, rules_threshold=None):
+    """
+    Run every extraction tool on text and merge the results into one dict.
+    strategy: "per_tool" | "combined" (defaults to EXTRACTION_STRATEGY)
+    mode: "sequential" | "concurrent" for per_tool (defaults to EXTRACTION_MODE)
+    deadline: overall seconds budget for concurrent mode (defaults to EXTRACTION_DEADLINE)
+    rules_threshold: confidence needed to skip a tool (defaults to RULES_CONFIDENCE_THRESHOLD)
+    """
+    try:
+        strategy = (strategy or EXTRACTION_STRATEGY).lower()
+        mode = (mode or EXTRACTION_MODE).lower()
+        out = empty_output()
+        resolved, remaining = _rules_pass(text, rules_threshold)
 
-        _log("DEBUG extracted: " + json.dumps(out, default=str))
+        if strategy == "combined":
+            out.update(_combined_with_rules(text, resolved, remaining))
+        else:
+            out.update(resolved)
+            if mode == "concurrent":
+                _run_concurrent(text, out, EXTRACTION_DEADLINE if deadline is None else deadline, remaining)
+            else:
+                _run_sequential(text, out, remaining)
+
+        _log("extracted", logging.DEBUG, result=out)
         return out
     except Exception as e:
-        _log(f"run_extraction FATAL (shouldn't happen): {repr(e)}")
+        _log(f"run_extraction FATAL (shouldn't happen): {repr(e)}", logging.ERROR)
         # return minimal fallback
-        return {
-            "hcp_name": None, "date": None, "time": None,
-            "topics_discussed": None, "materials_shared": [], "samples_distributed": [],
-            "sentiment": None, "sentiment_source": None, "summary": text[:200]
-        }
+        return empty_output(text)
 
 # ---------------------------
 # Dispatcher
@@ -339,12 +810,76 @@ def dispatch_tool(tool_name, *args, **kwargs):
         "materials": extract_materials_and_topics,
         "materials_and_topics": extract_materials_and_topics,
         "summary": summarize_interaction,
+        "combined": extract_combined,
     }
     fn = mapping.get(tool_name)
     if not fn:
         raise ValueError(f"Unknown tool: {tool_name}")
     return fn(*args, **kwargs)
 
+# ---------------------------
+# Incremental edits: route a correction to the tools it touches
+# ---------------------------
+_MONTHS = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*"
+# (dispatch_tool name, keyword pattern) — checked before any LLM routing
+EDIT_ROUTES = [
+    ("time", re.compile(r"\b(\d{1,2}(:\d{2})?\s*(am|pm)|\d{1,2}:\d{2}|time|o'?clock|noon|morning|afternoon|evening)\b", re.IGNORECASE)),
+    ("date", re.compile(r"\b(date|day|yesterday|today|tomorrow|\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{1,2}(st|nd|rd|th)?\s+" + _MONTHS + r"|" + _MONTHS + r"\s+\d{1,2})\b", re.IGNORECASE)),
+    ("hcp_name", re.compile(r"\b(dr\.?|prof\.?|doctor|name|hcp)\s", re.IGNORECASE)),
+    ("sentiment", re.compile(r"\b(sentiment|positive|negative|neutral|liked|disliked|interested|favou?rable|mood)\b", re.IGNORECASE)),
+    ("materials", re.compile(r"\b(brochures?|leaflets?|samples?|vials|packs|materials?|topics?|discussed|regarding)\b", re.IGNORECASE)),
+    ("summary", re.compile(r"\b(summary|summari[sz]e)\b", re.IGNORECASE)),
+]
+
+# dispatch_tool name -> EXTRACTION_TOOLS name (for merge + owned fields)
+_DISPATCH_TOOL_NAMES = {
+    "hcp_name": "extract_hcp_name",
+    "date": "extract_date",
+    "time": "extract_time",
+    "sentiment": "extract_sentiment",
+    "materials": "extract_materials_and_topics",
+    "summary": "summarize_interaction",
+}
+
+def _route_with_llm(text):
+    system = (
+        "A sales rep is correcting a logged HCP interaction. Which fields does the correction change? "
+        "Return ONLY JSON {\"fields\": [...]} using any of: hcp_name, date, time, sentiment, materials, summary."
+    )
+    parsed = _safe_json_load(_ask("route", system, text))
+    if isinstance(parsed, dict) and isinstance(parsed.get("fields"), list):
+        return [f for f in parsed["fields"] if f in _DISPATCH_TOOL_NAMES]
+    return []
+
+def route_correction(text):
+    """
+    dispatch_tool names a correction touches: keyword routes first, then one
+    cheap LLM classification, then every field tool as a last resort (the
+    summary is left alone there: summarizing the correction alone would
+    clobber the stored one).
+    """
+    tools = [name for name, pattern in EDIT_ROUTES if pattern.search(text)]
+    if not tools:
+        tools = _route_with_llm(text)
+    return tools or [t for t in _DISPATCH_TOOL_NAMES if t != "summary"]
+
+def run_partial_extraction(text, tools):
+    """Run only the given dispatch_tool names; returns just the fields they own. Never raises."""
+    lookup = {name: merge for name, _fn, merge in EXTRACTION_TOOLS}
+    out = {}
+    for tool in tools:
+        name = _DISPATCH_TOOL_NAMES.get(tool)
+        if not name:
+            continue
+        try:
+            result = _call_tool(name, functools.partial(dispatch_tool, tool), text)
+        except Exception as e:
+            _log(f"{name} error: {repr(e)}", logging.WARNING)
+            result = None
+        out.update(_tool_fields(name, lookup[name], result, text))
+    _log("partial extracted", logging.DEBUG, result=out)
+    return out
+
 # ---------------------------
 # Self-test helper (call from python -m)
 # ---------------------------
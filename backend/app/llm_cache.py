@@ -0,0 +1,199 @@
+"""
+Content-addressed cache for LLM responses
+- Keyed by a sha256 of (model, messages, max_tokens, temperature)
+- In-process LRU tier with TTL and max-entry eviction
+- Optional persistent SQLite tier (LLM_CACHE_PATH) shared across restarts/workers
+- Thread-safe; cache failures are logged by the caller and never raise
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+from . import metrics
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))               # seconds
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))    # memory tier
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")                               # unset = memory only
+LLM_CACHE_MAX_PERSISTENT_ENTRIES = int(os.getenv("LLM_CACHE_MAX_PERSISTENT_ENTRIES", "100000"))
+
+
+def make_key(model, messages, max_tokens, temperature, **extra):
+    """Stable hash of everything that influences the completion."""
+    material = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    material.update(extra)
+    raw = json.dumps(material, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _SqliteTier:
+    def __init__(self, path, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return value
+
+    def set(self, key, value, now):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes += 1
+            evicted = 0
+            # amortize eviction: sweep every 100 writes instead of on every insert
+            if self._writes % 100 == 0:
+                evicted += self._conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)
+                ).rowcount
+                count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                if count > self.max_entries:
+                    evicted += self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN ("
+                        " SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                        (count - self.max_entries,),
+                    ).rowcount
+            self._conn.commit()
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+class LLMCache:
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL,
+                 path=LLM_CACHE_PATH, max_persistent_entries=LLM_CACHE_MAX_PERSISTENT_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._disk = _SqliteTier(path, ttl, max_persistent_entries) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+                self.evictions += 1
+
+        value = self._disk.get(key, now) if self._disk else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, value, now)
+        return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+        if self._disk:
+            evicted = self._disk.set(key, value, now)
+            if evicted:
+                with self._lock:
+                    self.evictions += evicted
+
+    def _put_memory(self, key, value, now):
+        self._memory[key] = (value, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk:
+            self._disk.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "persistent": self._disk is not None,
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache instance, created lazily on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
+
+
+def _cache_gauges():
+    if _cache is None:
+        return
+    stats = _cache.stats()
+    for name in ("hits", "misses", "evictions", "entries"):
+        yield f"hcp_llm_cache_{name}", f"LLM cache {name} since process start", {}, stats[name]
+    yield "hcp_llm_cache_hit_ratio", "LLM cache hits / lookups", {}, stats["hit_rate"]
+
+metrics.register_gauges(_cache_gauges)
@@ -0,0 +1,117 @@
+"""
+Non-blocking structured logging
+- Callers only enqueue records (QueueHandler); a background QueueListener
+  thread does the formatting and file I/O
+- JSON-lines output, size- or time-based rotation
+- LOG_LEVEL controls verbosity; full LLM payloads are DEBUG records and are
+  further sampled with LOG_PAYLOAD_SAMPLE_RATE
+- A full queue drops records instead of blocking the request path
+"""
+
+import os
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_PATH = os.getenv("LOG_PATH", os.path.join(os.path.dirname(__file__), "langgraph_debug.log"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN")        # e.g. "midnight" / "H"; unset = rotate by size
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+
+ROOT_LOGGER = "hcp"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _file_handler():
+    if LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(LOG_PATH, when=LOG_ROTATE_WHEN,
+                                           backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    else:
+        handler = RotatingFileHandler(LOG_PATH, maxBytes=LOG_MAX_BYTES,
+                                      backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+
+def setup():
+    """Attach the queue handler and start the writer thread once per process."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        root.propagate = False
+        q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root.addHandler(_DroppingQueueHandler(q))
+        try:
+            _listener = QueueListener(q, _file_handler(), respect_handler_level=True)
+        except OSError:
+            # unwritable log path: keep the queue handler so callers never block or fail
+            _listener = QueueListener(q, logging.NullHandler())
+        _listener.start()
+        atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name):
+    setup()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def sample_payload(logger):
+    """Whether to capture full request/response bodies for this call."""
+    return logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_PAYLOAD_SAMPLE_RATE
+
+
+def dropped_records():
+    return _DroppingQueueHandler.dropped
@@ -1,10 +1,34 @@
-from fastapi import FastAPI, Depends, HTTPException
+import os
+import logging
+import json
+import asyncio
+import io
+import functools
+import contextvars
+import time
+import tempfile
+from datetime import date
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from .database import SessionLocal, engine
-from . import models, crud, langgraph_tools
+from .database import SessionLocal, sync_schema
+from . import models, crud, langgraph_tools, jobs, ingest, search, metrics, rollups, hcps, items, sentiment_model, similarity
 
-models.Base.metadata.create_all(bind=engine)
+sync_schema(models.Base.metadata)
+search.setup()
+# rollups are keyed by canonical HCP, so newly linked rows mean a rebuild
+rollups.setup(force=hcps.setup() > 0)
+items.setup()
+similarity.setup()
+
+# "sync" holds the request open for extraction; "async" queues it and returns an id
+CHAT_MODE = os.getenv("CHAT_MODE", "sync").lower()
+# "incremental" re-runs only the tools a correction touches and patches those
+# columns; "full" re-extracts everything and overwrites every field
+EDIT_MODE = os.getenv("EDIT_MODE", "incremental").lower()
 
 app = FastAPI(title="AI-First CRM - HCP Module")
 
@@ -16,6 +40,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def _instrument_requests(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    with metrics.span("http.request", method=request.method, path=request.url.path):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=request.method,
+                route=getattr(route, "path", "unmatched"), status=status,
+            )
+
 def get_db():
     db = SessionLocal()
     try:
@@ -24,6 +64,55 @@ def get_db():
         db.close()
 
 
+# ---------------------------------------------------------
+# Blocking work (LLM calls, sync SQLAlchemy) runs on a bounded pool
+# so a slow Groq call never stalls the event loop for other requests.
+# ---------------------------------------------------------
+API_BLOCKING_WORKERS = int(os.getenv("API_BLOCKING_WORKERS", "32"))
+_blocking_pool = ThreadPoolExecutor(max_workers=API_BLOCKING_WORKERS, thread_name_prefix="api-blocking")
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # copy the context so spans in the worker keep the request's trace id
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_blocking_pool, functools.partial(ctx.run, fn, *args, **kwargs))
+
+@app.on_event("startup")
+def _recover_jobs():
+    jobs.recover_unfinished()
+
+@app.on_event("startup")
+def _load_models():
+    # load once here so the first request doesn't pay for reading the file
+    sentiment_model.get_model()
+
+@app.on_event("shutdown")
+def _shutdown_pools():
+    _blocking_pool.shutdown(wait=False)
+    jobs.shutdown()
+
+
+def serialize_interaction(obj):
+    return {
+        "interaction_id": obj.id,
+        "status": obj.status or "done",
+        "hcp_name": obj.hcp_name,
+        "hcp_id": obj.hcp_id,
+        "date": obj.date.isoformat() if obj.date else None,
+        "time": obj.time,
+        "topics_discussed": obj.topics_discussed,
+        "materials_shared": obj.materials_shared or [],
+        "samples_distributed": obj.samples_distributed or [],
+        "sentiment": obj.sentiment,
+        "sentiment_source": obj.sentiment_source,
+        "outcomes": obj.outcomes,
+        "follow_up_date": obj.follow_up_date.isoformat() if obj.follow_up_date else None,
+        "summary": obj.summary,
+        "created_at": obj.created_at.isoformat() if obj.created_at else None,
+        "error": obj.error,
+    }
+
+
 # ---------------------------------------------------------
 # 1️⃣ MAIN INTERACTION LOGGING ENDPOINT
 # ---------------------------------------------------------
@@ -33,11 +122,23 @@ async def log_interaction(payload: dict, db: Session = Depends(get_db)):
     if not text:
         raise HTTPException(status_code=400, detail="text field required")
 
+    if (payload.get("mode") or CHAT_MODE) == "async":
+        # Persist raw text now; a background worker fills in the fields
+        pending = await run_blocking(crud.create_pending_interaction, db, text)
+        jobs.submit(pending.id)
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "status": "pending",
+            "message": "Interaction received. Extraction is running in the background.",
+            "interaction_id": pending.id,
+            "status_url": f"/api/interactions/{pending.id}/status",
+        })
+
     # Run full extraction pipeline (6 tools → merged output)
-    extracted = langgraph_tools.run_extraction(text)
+    extracted = await run_blocking(langgraph_tools.run_extraction, text)
 
     # Save interaction to DB
-    saved = crud.create_interaction(db, extracted, raw_text=text)
+    saved = await run_blocking(crud.create_interaction, db, extracted, raw_text=text)
 
     message = (
         "✔️ Interaction logged successfully! The details (HCP Name, Date, Sentiment, and Materials) "
@@ -52,6 +153,174 @@ async def log_interaction(payload: dict, db: Session = Depends(get_db)):
     }
 
 
+# ---------------------------------------------------------
+# 1️⃣a STREAMING VARIANT (NDJSON: one "field" event per tool, then "saved")
+# ---------------------------------------------------------
+def _stream_chat(text):
+    extracted = langgraph_tools.empty_output()
+    for tool, fields in langgraph_tools.iter_extraction(text):
+        extracted.update(fields)
+        yield json.dumps({"event": "field", "tool": tool, "data": fields}, default=str) + "\n"
+
+    db = SessionLocal()
+    try:
+        saved = crud.create_interaction(db, extracted, raw_text=text)
+        yield json.dumps({"event": "saved", "interaction_id": saved.id, "data": extracted}, default=str) + "\n"
+    except Exception as e:
+        langgraph_tools._log(f"stream save error: {repr(e)}", logging.ERROR)
+        yield json.dumps({"event": "error", "detail": "failed to save interaction"}) + "\n"
+    finally:
+        db.close()
+
+@app.post("/api/interactions/chat/stream")
+async def log_interaction_stream(payload: dict):
+    text = payload.get("text", "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="text field required")
+    # sync generator: Starlette iterates it in a worker thread, off the event loop
+    return StreamingResponse(_stream_chat(text), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------------
+# 1️⃣b ASYNC JOB STATUS (poll after POST /chat with mode=async)
+# ---------------------------------------------------------
+@app.get("/api/interactions/{interaction_id}/status")
+async def interaction_status(interaction_id: str, db: Session = Depends(get_db)):
+    obj = await run_blocking(crud.get_interaction, db, interaction_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="interaction not found")
+    return serialize_interaction(obj)
+
+
+# ---------------------------------------------------------
+# 1️⃣c BULK IMPORT (JSONL or CSV request body, streamed)
+# ---------------------------------------------------------
+@app.post("/api/interactions/bulk")
+async def bulk_import(request: Request, format: str = "jsonl", text_field: str = "text",
+                      chunk_size: int = None, concurrency: int = None):
+    if format not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="format must be jsonl or csv")
+
+    # spool the body (memory up to 8 MB, then disk) instead of buffering it whole
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        stream = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        stats = await run_blocking(
+            ingest.ingest, stream, format, text_field,
+            concurrency=concurrency, chunk_size=chunk_size, log=langgraph_tools._log,
+        )
+    finally:
+        spool.close()
+    return {"success": True, "stats": stats}
+
+
+# ---------------------------------------------------------
+# 1️⃣d LIST / FILTER (keyset pagination, newest first)
+# ---------------------------------------------------------
+@app.get("/api/interactions")
+async def list_interactions(hcp: Optional[str] = None, hcp_id: Optional[str] = None, date_from: Optional[date] = None,
+                            date_to: Optional[date] = None, sentiment: Optional[str] = None,
+                            material: Optional[str] = None, limit: int = 50,
+                            cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    limit = max(1, min(limit, 200))
+    try:
+        rows, next_cursor = await run_blocking(
+            crud.list_interactions, db, hcp_name=hcp, date_from=date_from, date_to=date_to,
+            sentiment=sentiment.capitalize() if sentiment else None, material=material,
+            limit=limit, cursor=cursor, hcp_id=hcp_id,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return {"items": [serialize_interaction(r) for r in rows], "next_cursor": next_cursor}
+
+
+# ---------------------------------------------------------
+# 1️⃣e FULL-TEXT SEARCH (raw_text, summary, topics_discussed)
+# ---------------------------------------------------------
+@app.get("/api/interactions/search")
+async def search_interactions(q: str, limit: int = 20, db: Session = Depends(get_db)):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q required")
+    limit = max(1, min(limit, 100))
+    hits = await run_blocking(crud.search_interactions, db, q, limit=limit)
+    return {
+        "query": q,
+        "items": [dict(serialize_interaction(obj), score=score, snippet=snippet) for obj, score, snippet in hits],
+    }
+
+
+# ---------------------------------------------------------
+# 1️⃣f SIMILAR PAST INTERACTIONS (hashed-vector cosine search)
+# ---------------------------------------------------------
+@app.get("/api/interactions/{interaction_id}/similar")
+async def similar_interactions(interaction_id: str, k: int = 5, db: Session = Depends(get_db)):
+    obj = await run_blocking(crud.get_interaction, db, interaction_id)
+    if not obj:
+        raise HTTPException(status_code=404, detail="interaction not found")
+    k = max(1, min(k, 50))
+    hits = await run_blocking(crud.similar_interactions, db, k=k, interaction=obj)
+    return {
+        "interaction_id": interaction_id,
+        "items": [dict(serialize_interaction(o), score=round(score, 4)) for o, score in hits],
+    }
+
+
+# ---------------------------------------------------------
+# 1️⃣g HCP DASHBOARD (pre-aggregated rollups, item aggregates, name resolution)
+# ---------------------------------------------------------
+@app.get("/api/dashboard/hcps")
+async def dashboard_top_hcps(limit: int = 20, db: Session = Depends(get_db)):
+    limit = max(1, min(limit, 200))
+    return {"items": await run_blocking(rollups.top_hcps, db, limit=limit)}
+
+@app.get("/api/dashboard/hcps/{hcp_name}")
+async def dashboard_hcp(hcp_name: str, period: str = "week", buckets: int = 12, top: int = 10,
+                        db: Session = Depends(get_db)):
+    if period not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="period must be day or week")
+    buckets = max(1, min(buckets, 366))
+    top = max(1, min(top, 100))
+    # any spelling of the name reaches the canonical HCP's rollups
+    hcp_id = await run_blocking(hcps.lookup, hcp_name)
+    result = None
+    if hcp_id is not None:
+        result = await run_blocking(rollups.hcp_dashboard, db, hcp_id, period=period, buckets=buckets, top=top)
+    if result is None:
+        raise HTTPException(status_code=404, detail="no interactions for this HCP")
+    return result
+
+@app.get("/api/items/summary")
+async def items_summary(kind: Optional[str] = None, product: Optional[str] = None, hcp: Optional[str] = None,
+                        date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        group_by: str = "product", limit: int = 100, db: Session = Depends(get_db)):
+    if kind not in (None, "material", "sample"):
+        raise HTTPException(status_code=400, detail="kind must be material or sample")
+    if group_by not in ("product", "hcp", "month"):
+        raise HTTPException(status_code=400, detail="group_by must be product, hcp or month")
+    hcp_id = None
+    if hcp:
+        hcp_id = await run_blocking(hcps.lookup, hcp)
+        if hcp_id is None:
+            return {"group_by": group_by, "items": []}
+    rows = await run_blocking(items.aggregate, db, kind=kind, product=product, hcp_id=hcp_id,
+                              date_from=date_from, date_to=date_to, group_by=group_by,
+                              limit=max(1, min(limit, 1000)))
+    if group_by == "hcp":
+        for r in rows:
+            r["hcp_name"] = hcps.display_name(r["key"])
+    return {"group_by": group_by, "items": rows}
+
+@app.get("/api/hcps/resolve")
+async def resolve_hcp(name: str):
+    hcp_id = await run_blocking(hcps.lookup, name)
+    if hcp_id is None:
+        raise HTTPException(status_code=404, detail="no matching HCP")
+    return {"hcp_id": hcp_id, "name": hcps.display_name(hcp_id), "normalized": hcps.normalize(name)}
+
+
 # ---------------------------------------------------------
 # 2️⃣ EDIT INTERACTION (RE-RUN EXTRACTOR OR SINGLE TOOL)
 # ---------------------------------------------------------
@@ -61,16 +330,27 @@ async def edit_interaction(interaction_id: str, payload: dict, db: Session = Dep
     if not correction:
         raise HTTPException(status_code=400, detail="text required")
 
-    existing = crud.get_interaction(db, interaction_id)
+    existing = await run_blocking(crud.get_interaction, db, interaction_id)
     if not existing:
         raise HTTPException(status_code=404, detail="interaction not found")
 
-    # Run extraction on edited text
-    updates = langgraph_tools.run_extraction(correction)
-    saved = crud.update_interaction(db, interaction_id, updates)
+    mode = (payload.get("mode") or EDIT_MODE).lower()
+    if mode == "full":
+        # Run extraction on edited text
+        tools = None
+        updates = await run_blocking(langgraph_tools.run_extraction, correction)
+        saved = await run_blocking(crud.update_interaction, db, interaction_id, updates)
+        changed = list(updates)
+    else:
+        tools = await run_blocking(langgraph_tools.route_correction, correction)
+        updates = await run_blocking(langgraph_tools.run_partial_extraction, correction, tools)
+        saved, changed = await run_blocking(crud.patch_interaction, db, interaction_id, updates)
 
     return {
         "success": True,
+        "mode": "full" if mode == "full" else "incremental",
+        "tools": tools,
+        "changed_fields": changed,
         "updated": {
             "interaction_id": saved.id,
             "hcp_name": saved.hcp_name,
@@ -94,24 +374,46 @@ async def summarize(payload: dict):
     if not text:
         raise HTTPException(status_code=400, detail="text required")
 
-    summary = langgraph_tools.summarize_interaction(text).get("summary")
+    summary = (await run_blocking(langgraph_tools.summarize_interaction, text)).get("summary")
     return {"summary": summary}
 
 
 # ---------------------------------------------------------
-# 4️⃣ NEXT BEST ACTION (Based on sentiment)
+# 4️⃣ NEXT BEST ACTION (similar past interactions, then sentiment)
 # ---------------------------------------------------------
 @app.post("/api/interactions/next-best-action")
-async def next_best_action(payload: dict):
+async def next_best_action(payload: dict, db: Session = Depends(get_db)):
     extracted = payload.get("data") or {}
-    actions = []
+    try:
+        k = max(1, min(int(payload.get("k") or 10), 50))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="k must be an integer")
+
+    interaction = None
+    if payload.get("interaction_id"):
+        interaction = await run_blocking(crud.get_interaction, db, payload["interaction_id"])
+    text = similarity.document(extracted) or payload.get("text") or ""
+    # only the note itself is excluded (by id): identical notes under other ids are the best evidence
+    exclude = [payload["interaction_id"]] if payload.get("interaction_id") else []
+    neighbors = await run_blocking(crud.similar_interactions, db, k=k, interaction=interaction, text=text,
+                                   exclude=exclude)
+    suggestions = similarity.neighbor_actions(neighbors)
+    actions = [s["action"] for s in suggestions]
 
-    if extracted.get("sentiment") == "Positive":
+    sentiment = extracted.get("sentiment") or (interaction.sentiment if interaction else None)
+    if sentiment == "Positive":
         actions.append("Schedule product trial / follow-up meeting")
     else:
         actions.append("Send additional informational materials")
 
-    return {"next_best_actions": actions}
+    return {
+        "next_best_actions": actions,
+        "suggestions": suggestions,
+        "similar": [
+            {"interaction_id": o.id, "score": round(score, 4), "hcp_name": o.hcp_name, "sentiment": o.sentiment}
+            for o, score in neighbors
+        ],
+    }
 
 
 # ---------------------------------------------------------
@@ -123,10 +425,18 @@ async def entities(payload: dict):
     if not text:
         raise HTTPException(status_code=400, detail="text required")
 
-    entities = langgraph_tools.dispatch_tool("materials", text)
+    entities = await run_blocking(langgraph_tools.dispatch_tool, "materials", text)
     return {"entities": entities}
 
 
+# ---------------------------------------------------------
+# METRICS (Prometheus text format)
+# ---------------------------------------------------------
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ---------------------------------------------------------
 # ROOT
 # ---------------------------------------------------------
@@ -0,0 +1,202 @@
+"""
+In-process metrics with a Prometheus text exposition (GET /metrics)
+- Counter / Histogram with labels; thread-safe, no external dependency
+- Callback gauges sampled at scrape time (e.g. LLM cache stats)
+- span(): per-request/per-tool spans; uses OpenTelemetry when installed and
+  OTEL_ENABLED is on, otherwise times the block and logs it at DEBUG
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:
+    _otel_trace = None
+
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_gauge_callbacks = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels):
+        """(bucket_counts, sum, count) for one label set."""
+        with self._lock:
+            series = self._series.get(_label_key(self.labelnames, labels))
+            if series is None:
+                return [0] * len(self.buckets), 0.0, 0
+            return list(series[:-2]), series[-2], series[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = _format_labels(self.labelnames, key, [("le", repr(float(bound)))])
+                    lines.append(f"{self.name}_bucket{le} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def register_gauges(callback):
+    """callback() -> iterable of (name, documentation, {labels}, value), sampled on every scrape."""
+    _gauge_callbacks.append(callback)
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    seen = set()
+    for callback in _gauge_callbacks:
+        try:
+            samples = list(callback())
+        except Exception:
+            continue
+        for name, documentation, labels, value in samples:
+            if name not in seen:
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+                seen.add(name)
+            names = tuple(labels)
+            lines.append(f"{name}{_format_labels(names, tuple(str(labels[n]) for n in names))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------------
+# Application metrics
+# ---------------------------
+HTTP_REQUEST_SECONDS = Histogram(
+    "hcp_http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+TOOL_SECONDS = Histogram(
+    "hcp_tool_duration_seconds", "Wall time per extraction tool call", ("tool",))
+EXTRACTION_TIMEOUTS = Counter(
+    "hcp_extraction_timeouts_total", "Concurrent extraction tools still queued or running at the request deadline",
+    ("tool", "stage"))
+TOOL_FALLBACKS = Counter(
+    "hcp_tool_fallback_total", "Extractor results that came from the non-LLM fallback path", ("tool",))
+GROQ_SECONDS = Histogram(
+    "hcp_groq_request_duration_seconds", "Groq HTTP round-trip latency (including retries)", ("model",))
+GROQ_RESPONSES = Counter(
+    "hcp_groq_responses_total", "Groq responses by HTTP status ('error' = no response)", ("status",))
+GROQ_TOKENS = Counter(
+    "hcp_groq_tokens_total", "Tokens reported in the Groq usage block", ("model", "kind"))
+GROQ_HEDGES = Counter(
+    "hcp_groq_hedges_total", "Hedged Groq calls: fired or skipped (busy/budget), and which request answered first", ("outcome",))
+GROQ_NONE = Counter(
+    "hcp_groq_call_none_total", "groq_call invocations that returned None", ("reason",))
+PROMPT_TOKENS = Counter(
+    "hcp_prompt_estimated_tokens_total", "Locally estimated prompt tokens sent vs trimmed by windowing", ("tool", "kind"))
+SENTIMENT_MODEL = Counter(
+    "hcp_sentiment_model_total", "Local sentiment classifier decisions", ("outcome",))
+DB_COMMIT_SECONDS = Histogram(
+    "hcp_db_commit_duration_seconds", "Latency of crud commits", ("op",))
+
+
+# ---------------------------
+# Spans
+# ---------------------------
+_trace_id = contextvars.ContextVar("hcp_trace_id", default=None)
+_span_logger = logging.getLogger("hcp.spans")
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    if OTEL_ENABLED and _otel_trace is not None:
+        with _otel_trace.get_tracer("hcp").start_as_current_span(name, attributes=attributes) as s:
+            yield s
+        return
+
+    token = None
+    if _trace_id.get() is None:
+        token = _trace_id.set(uuid.uuid4().hex)
+    start = time.perf_counter()
+    try:
+        yield None
+    finally:
+        if _span_logger.isEnabledFor(logging.DEBUG):
+            _span_logger.debug("span", extra={"fields": dict(
+                attributes, span=name, trace_id=_trace_id.get(),
+                duration_ms=round((time.perf_counter() - start) * 1000, 3))})
+        if token is not None:
+            _trace_id.reset(token)
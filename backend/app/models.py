@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON
+from sqlalchemy import Column, String, Date, DateTime, Text, JSON, Index, Integer, ForeignKey
 from datetime import datetime
 from .database import Base
 import uuid
@@ -6,14 +6,24 @@ import uuid
 def make_uuid():
     return str(uuid.uuid4())
 
+class Hcp(Base):
+    """Canonical HCP; Interaction.hcp_id points here (resolved by hcps.py)."""
+    __tablename__ = "hcp"
+
+    id = Column(String, primary_key=True)              # uuid5 of normalized_key
+    name = Column(String, nullable=False)              # first name form seen
+    normalized_key = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Interaction(Base):
     __tablename__ = "interaction"
 
     id = Column(String, primary_key=True, default=make_uuid)
     raw_text = Column(Text, nullable=True)
 
-    hcp_name = Column(String, nullable=True)
-    date = Column(String, nullable=True)           # ISO YYYY-MM-DD
+    hcp_name = Column(String, nullable=True)          # as extracted
+    hcp_id = Column(String, ForeignKey("hcp.id"), nullable=True)   # resolved canonical HCP (hcps.py)
+    date = Column(Date, nullable=True, index=True)
     time = Column(String, nullable=True)           # HH:MM (24h)
 
     topics_discussed = Column(Text, nullable=True)
@@ -24,7 +34,70 @@ class Interaction(Base):
     sentiment_source = Column(String, nullable=True)  # observed / inferred / None
 
     outcomes = Column(Text, nullable=True)
-    follow_up_date = Column(String, nullable=True)    # ISO
+    follow_up_date = Column(Date, nullable=True)
 
     summary = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    status = Column(String, nullable=True)            # pending / running / done / failed (None = done)
+    error = Column(Text, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)      # when a job worker set it running (lease start)
+
+    __table_args__ = (
+        # filter + keyset order (created_at DESC, id DESC) served from one index
+        Index("ix_interaction_hcp_name_created_at", "hcp_name", "created_at", "id"),
+        Index("ix_interaction_hcp_id_created_at", "hcp_id", "created_at", "id"),
+        Index("ix_interaction_sentiment_created_at", "sentiment", "created_at", "id"),
+    )
+
+
+class HcpRollup(Base):
+    """Per-HCP counters for one day / week / all-time bucket (maintained by rollups.py)."""
+    __tablename__ = "hcp_rollup"
+
+    hcp_id = Column(String, primary_key=True)          # canonical Hcp.id; the name is joined on read
+    period = Column(String, primary_key=True)          # day / week / total
+    period_start = Column(Date, primary_key=True)
+
+    interactions = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    neutral = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    materials = Column(Integer, nullable=False, default=0)
+    samples = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_hcp_rollup_period_interactions", "period", "interactions"),
+    )
+
+class HcpRollupItem(Base):
+    """Per-item material/sample counts in the same buckets as HcpRollup."""
+    __tablename__ = "hcp_rollup_item"
+
+    hcp_id = Column(String, primary_key=True)
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    kind = Column(String, primary_key=True)            # material / sample
+    item = Column(String, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+class InteractionItem(Base):
+    """One material or sample from an interaction, parsed by items.py."""
+    __tablename__ = "interaction_item"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    interaction_id = Column(String, ForeignKey("interaction.id", ondelete="CASCADE"), nullable=False, index=True)
+    hcp_id = Column(String, nullable=True)            # copied from the interaction
+    date = Column(Date, nullable=True)                # interaction date, else created_at date
+
+    kind = Column(String, nullable=False)             # material / sample
+    item = Column(String, nullable=False)             # entry as extracted, e.g. "5 sample(s)"
+    product = Column(String, nullable=True)
+    product_key = Column(String, nullable=True)       # lower-cased product for grouping/filtering
+    quantity = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        Index("ix_interaction_item_kind_product_date", "kind", "product_key", "date"),
+        Index("ix_interaction_item_hcp_kind_date", "hcp_id", "kind", "date"),
+    )
@@ -0,0 +1,125 @@
+"""
+Token-budgeted prompt construction for the Groq extractors
+- estimate_tokens(): local estimate (no tokenizer download, no API call)
+- window(): only the sentences a tool needs, e.g. time-like sentences for the
+  time tool; falls back to the head of the note when nothing matches
+- every tool has an input budget and a tight max_tokens sized for its answer
+- GROQ_JSON_MODE adds response_format={"type": "json_object"} so replies are
+  bare JSON and the regex retry in _safe_json_load is rarely needed
+
+Overrides use "tool=value" lists, e.g. PROMPT_MAX_TOKENS="summary=200,time=32".
+"""
+
+import os
+import re
+import math
+from . import metrics
+
+PROMPT_WINDOWS = os.getenv("PROMPT_WINDOWS", "true").lower() in ("1", "true", "yes")
+GROQ_JSON_MODE = os.getenv("GROQ_JSON_MODE", "false").lower() in ("1", "true", "yes")
+
+
+def _overrides(env_name, defaults):
+    values = dict(defaults)
+    for part in os.getenv(env_name, "").split(","):
+        name, _, value = part.partition("=")
+        if name.strip() in values and value.strip().isdigit():
+            values[name.strip()] = int(value)
+    return values
+
+
+# answer sizes: {"time": "14:30"} is ~8 tokens, a 2-sentence summary ~60
+TOOL_MAX_TOKENS = _overrides("PROMPT_MAX_TOKENS", {
+    "hcp_name": 40, "date": 32, "time": 32, "sentiment": 24,
+    "materials": 200, "summary": 160, "combined": 400, "route": 60,
+})
+# input token budget for the user message
+TOOL_INPUT_BUDGETS = _overrides("PROMPT_INPUT_BUDGETS", {
+    "hcp_name": 300, "date": 200, "time": 160, "sentiment": 400,
+    "materials": 600, "summary": 1200, "combined": 1600, "route": 300,
+})
+
+_MONTHS = r"jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec"
+_WINDOW_PATTERNS = {
+    "hcp_name": re.compile(r"\b(?:dr|doctor|prof|professor|mr|mrs|ms)\b\.?|\bmet\b|\bwith\b", re.IGNORECASE),
+    "date": re.compile(
+        rf"\b\d{{1,4}}[-/.]\d{{1,2}}(?:[-/.]\d{{1,4}})?\b|\b(?:{_MONTHS})[a-z]*\b|"
+        r"\b(?:today|yesterday|tomorrow|monday|tuesday|wednesday|thursday|friday|saturday|sunday|date)\b",
+        re.IGNORECASE),
+    "time": re.compile(
+        r"\b\d{1,2}[:.]\d{2}\b|\b\d{1,2}\s*(?:am|pm|a\.m\.|p\.m\.)|\b(?:noon|midday|morning|afternoon|"
+        r"evening|o'clock|time)\b", re.IGNORECASE),
+    "sentiment": re.compile(
+        r"\b(?:sentiment|positive|negative|neutral|liked|disliked|interested|concern\w*|skeptic\w*|"
+        r"sceptic\w*|happy|unhappy|satisf\w*|impressed|keen|enthusias\w*|hesitant|reluctant|"
+        r"receptive|agreed|declined|refused)\b", re.IGNORECASE),
+    "materials": re.compile(
+        r"\b(?:brochure|leaflet|pamphlet|flyer|material|deck|handout|sample|vial|pack|box|"
+        r"shared|gave|handed|left|provided|discussed|about|regarding|topic|presented)\w*", re.IGNORECASE),
+}
+# sentence breaks, except after common name titles ("Met Dr. Smith")
+_SENTENCE_BREAK = re.compile(
+    r"(?i:(?<!\bdr\.)(?<!\bmr\.)(?<!\bms\.)(?<!\bmrs\.)(?<!\bprof\.)(?<!\bst\.))(?<=[.!?])\s+|\n+")
+
+
+def estimate_tokens(text):
+    """~4 characters per token, but never fewer than ~1.3 tokens per word."""
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), math.ceil(len(text.split()) * 1.3))
+
+
+def truncate(text, budget):
+    """Fit text into budget tokens, keeping the head and a short tail."""
+    if estimate_tokens(text) <= budget:
+        return text
+    chars = max(budget * 4 - 8, 16)
+    head = int(chars * 0.75)
+    return text[:head].rstrip() + " … " + text[-(chars - head):].lstrip()
+
+
+def window(tool, text):
+    """Sentences relevant to tool, in original order and within its budget."""
+    budget = TOOL_INPUT_BUDGETS.get(tool, TOOL_INPUT_BUDGETS["combined"])
+    text = text or ""
+    pattern = _WINDOW_PATTERNS.get(tool) if PROMPT_WINDOWS else None
+    if pattern is None or estimate_tokens(text) <= budget // 2:
+        # short notes go through whole: windowing would save almost nothing
+        return truncate(text, budget)
+    picked, seen = [], set()
+    for pos, sentence in enumerate(s.strip() for s in _SENTENCE_BREAK.split(text)):
+        hits = len(pattern.findall(sentence)) if sentence and sentence not in seen else 0
+        if hits:
+            seen.add(sentence)
+            picked.append((hits, pos, sentence))
+    if not picked:
+        return truncate(text, budget)
+    # densest sentences first until the budget is spent, then back in note order
+    kept, used = [], 0
+    for hits, pos, sentence in sorted(picked, key=lambda p: (-p[0], p[1])):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost <= budget:
+            kept.append((pos, sentence))
+            used += cost
+    if not kept:
+        return truncate(picked[0][2], budget)
+    return " ".join(sentence for _, sentence in sorted(kept))
+
+
+def build(tool, system, text):
+    """
+    (messages, groq_call kwargs) for one tool: the windowed user text, the
+    tool's max_tokens and, in JSON mode, response_format.
+    """
+    user = window(tool, text)
+    sent = estimate_tokens(user)
+    metrics.PROMPT_TOKENS.inc(sent, tool=tool, kind="sent")
+    metrics.PROMPT_TOKENS.inc(max(estimate_tokens(text) - sent, 0), tool=tool, kind="trimmed")
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+    kwargs = {"max_tokens": TOOL_MAX_TOKENS.get(tool, TOOL_MAX_TOKENS["combined"])}
+    if GROQ_JSON_MODE:
+        kwargs["response_format"] = {"type": "json_object"}
+    return messages, kwargs
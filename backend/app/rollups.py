@@ -0,0 +1,261 @@
+"""
+Pre-aggregated per-HCP engagement rollups
+- hcp_rollup: one row per (hcp_id, period, period_start) with interaction and
+  sentiment counts plus the number of materials/samples handed out;
+  period is "day", "week" (Monday start) or "total" (one all-time row)
+- keyed by the canonical hcp_id, never a name: an HCP created earlier in the
+  same transaction has no display name yet, and interactions without an
+  hcp_id (no usable name) are not counted; reads join hcp for the name
+- hcp_rollup_item: per-item counts for materials and samples in the same buckets
+- crud applies deltas inside the same transaction as each write: the old
+  contribution of a row is subtracted and the new one added, using atomic
+  "count = count + n" upserts so concurrent writers never lose updates
+- rebuild() recomputes everything from the interaction table (backfills);
+  setup() runs it once when the tables are still empty (or still keyed by name)
+
+CLI:  python -m app.rollups rebuild
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, inspect
+from .models import Interaction, Hcp, HcpRollup, HcpRollupItem
+
+PERIODS = ("day", "week", "total")
+TOTAL_START = date(1970, 1, 1)      # period_start of the single "total" bucket
+SENTIMENTS = {"Positive": "positive", "Neutral": "neutral", "Negative": "negative"}
+_COUNTERS = ("interactions", "positive", "neutral", "negative", "materials", "samples")
+
+
+def _item_name(item):
+    if isinstance(item, dict):
+        item = item.get("name") or item.get("item") or json.dumps(item, sort_keys=True)
+    item = str(item).strip()
+    return item or None
+
+
+def contribution(fields):
+    """
+    What one interaction adds to the rollups, as a hashable tuple, or None
+    when it shouldn't be counted (no HCP yet, or extraction not finished).
+    fields: an Interaction or a dict of its columns.
+    """
+    get = fields.get if isinstance(fields, dict) else (lambda k: getattr(fields, k, None))
+    # bucket by canonical HCP so "Dr. Smith" and "dr smith" share one row
+    hcp = get("hcp_id")
+    if not hcp or get("status") not in (None, "done"):
+        return None
+    day = get("date")
+    if not isinstance(day, date):
+        created = get("created_at") or datetime.utcnow()
+        day = created.date()
+    materials = tuple(n for n in map(_item_name, get("materials_shared") or []) if n)
+    samples = tuple(n for n in map(_item_name, get("samples_distributed") or []) if n)
+    return (hcp, day, get("sentiment"), materials, samples)
+
+
+def _buckets(day):
+    return (("day", day), ("week", day - timedelta(days=day.weekday())), ("total", TOTAL_START))
+
+
+def _counts(contrib, sign):
+    _, _, sentiment, materials, samples = contrib
+    counts = dict.fromkeys(_COUNTERS, 0)
+    counts["interactions"] = sign
+    if sentiment in SENTIMENTS:
+        counts[SENTIMENTS[sentiment]] = sign
+    counts["materials"] = sign * len(materials)
+    counts["samples"] = sign * len(samples)
+    return counts
+
+
+def _upsert_add(db, model, keys, deltas):
+    """INSERT the row, or add deltas to the existing counters in one statement."""
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={k: table.c[k] + stmt.excluded[k] for k in deltas},
+        )
+        db.execute(stmt)
+        return
+    # portable fallback: UPDATE, then INSERT when no row existed
+    where = [table.c[k] == v for k, v in keys.items()]
+    result = db.execute(table.update().where(*where).values({k: table.c[k] + v for k, v in deltas.items()}))
+    if result.rowcount == 0:
+        db.execute(table.insert().values(**keys, **deltas))
+
+
+def _apply(db, contrib, sign):
+    hcp, day, _, materials, samples = contrib
+    counts = _counts(contrib, sign)
+    items = defaultdict(int)
+    for name in materials:
+        items[("material", name)] += sign
+    for name in samples:
+        items[("sample", name)] += sign
+    for period, start in _buckets(day):
+        keys = {"hcp_id": hcp, "period": period, "period_start": start}
+        _upsert_add(db, HcpRollup, keys, counts)
+        for (kind, name), n in items.items():
+            _upsert_add(db, HcpRollupItem, dict(keys, kind=kind, item=name), {"count": n})
+
+
+def apply_delta(db, old, new):
+    """Move one interaction's contribution from old to new (either may be None)."""
+    if old == new:
+        return
+    if old is not None:
+        _apply(db, old, -1)
+    if new is not None:
+        _apply(db, new, +1)
+
+
+def _drop_name_keyed_tables():
+    """Drop rollup tables from before they were keyed by hcp_id (they are rebuilt). True when dropped."""
+    from .database import engine
+    inspector = inspect(engine)
+    if "hcp_rollup" not in inspector.get_table_names():
+        return False
+    if "hcp_name" not in inspector.get_pk_constraint("hcp_rollup").get("constrained_columns", []):
+        return False
+    for model in (HcpRollupItem, HcpRollup):
+        model.__table__.drop(bind=engine, checkfirst=True)
+        model.__table__.create(bind=engine)
+    return True
+
+
+def setup(force=False):
+    """Backfill on first start: rebuild when forced, or when the rollups are empty but interactions exist."""
+    from .database import SessionLocal
+    force = _drop_name_keyed_tables() or force
+    db = SessionLocal()
+    try:
+        if force or (db.query(HcpRollup.hcp_id).first() is None
+                     and db.query(Interaction.id).first() is not None):
+            rebuild(db)
+    finally:
+        db.close()
+
+
+def rebuild(db, batch_size=1000):
+    """Recompute every rollup row from the interaction table. Returns the number of rows counted."""
+    totals = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+    items = defaultdict(int)
+    counted = 0
+    cols = (Interaction.hcp_id, Interaction.date, Interaction.created_at, Interaction.sentiment,
+            Interaction.materials_shared, Interaction.samples_distributed, Interaction.status)
+    for row in db.query(*cols).yield_per(batch_size):
+        contrib = contribution(dict(row._mapping))
+        if contrib is None:
+            continue
+        counted += 1
+        counts = _counts(contrib, 1)
+        hcp, day, _, materials, samples = contrib
+        for period, start in _buckets(day):
+            bucket = totals[(hcp, period, start)]
+            for k, v in counts.items():
+                bucket[k] += v
+            for name in materials:
+                items[(hcp, period, start, "material", name)] += 1
+            for name in samples:
+                items[(hcp, period, start, "sample", name)] += 1
+
+    db.query(HcpRollupItem).delete(synchronize_session=False)
+    db.query(HcpRollup).delete(synchronize_session=False)
+    db.bulk_insert_mappings(HcpRollup, [
+        dict(hcp_id=h, period=p, period_start=s, **counts) for (h, p, s), counts in totals.items()
+    ])
+    db.bulk_insert_mappings(HcpRollupItem, [
+        dict(hcp_id=h, period=p, period_start=s, kind=k, item=i, count=n) for (h, p, s, k, i), n in items.items()
+    ])
+    db.commit()
+    return counted
+
+
+# ---------------------------
+# Reads (all index lookups on the rollup primary keys)
+# ---------------------------
+def _counters(row):
+    return {
+        "interactions": row.interactions,
+        "sentiment": {"Positive": row.positive, "Neutral": row.neutral, "Negative": row.negative},
+        "materials": row.materials,
+        "samples": row.samples,
+    }
+
+
+def _top_items(db, hcp_id, kind, limit):
+    rows = (db.query(HcpRollupItem.item, HcpRollupItem.count)
+            .filter(HcpRollupItem.hcp_id == hcp_id, HcpRollupItem.period == "total",
+                    HcpRollupItem.period_start == TOTAL_START, HcpRollupItem.kind == kind,
+                    HcpRollupItem.count > 0)
+            .order_by(HcpRollupItem.count.desc(), HcpRollupItem.item)
+            .limit(limit).all())
+    return [{"item": item, "count": count} for item, count in rows]
+
+
+def hcp_dashboard(db, hcp_id, period="week", buckets=12, top=10):
+    """Totals, last contact, the latest `buckets` day/week rows and top items for one HCP, or None."""
+    total = db.get(HcpRollup, (hcp_id, "total", TOTAL_START))
+    if total is None or total.interactions <= 0:
+        return None
+    last_contact = (db.query(func.max(HcpRollup.period_start))
+                    .filter(HcpRollup.hcp_id == hcp_id, HcpRollup.period == "day", HcpRollup.interactions > 0)
+                    .scalar())
+    series = (db.query(HcpRollup)
+              .filter(HcpRollup.hcp_id == hcp_id, HcpRollup.period == period, HcpRollup.interactions > 0)
+              .order_by(HcpRollup.period_start.desc())
+              .limit(buckets).all())
+    return {
+        "hcp_id": hcp_id,
+        "hcp_name": db.query(Hcp.name).filter(Hcp.id == hcp_id).scalar(),
+        "last_contact": last_contact.isoformat() if last_contact else None,
+        "totals": _counters(total),
+        "period": period,
+        "series": [dict(period_start=r.period_start.isoformat(), **_counters(r)) for r in reversed(series)],
+        "top_materials": _top_items(db, hcp_id, "material", top),
+        "top_samples": _top_items(db, hcp_id, "sample", top),
+    }
+
+
+def top_hcps(db, limit=20):
+    """HCPs with the most interactions, from the all-time rows."""
+    rows = (db.query(HcpRollup, Hcp.name)
+            .outerjoin(Hcp, Hcp.id == HcpRollup.hcp_id)
+            .filter(HcpRollup.period == "total", HcpRollup.interactions > 0)
+            .order_by(HcpRollup.interactions.desc(), HcpRollup.hcp_id)
+            .limit(limit).all())
+    return [dict(hcp_id=r.hcp_id, hcp_name=name, **_counters(r)) for r, name in rows]
+
+
+def main(argv=None):
+    from .database import SessionLocal, sync_schema
+    from . import models
+
+    parser = argparse.ArgumentParser(description="Maintain the per-HCP rollup tables.")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    sync_schema(models.Base.metadata)
+    _drop_name_keyed_tables()
+    db = SessionLocal()
+    try:
+        counted = rebuild(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps({"command": args.command, "interactions": counted}))
+    return counted
+
+
+if __name__ == "__main__":
+    main()
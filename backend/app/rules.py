@@ -0,0 +1,239 @@
+"""
+Zero-LLM rules engine for templated call notes
+- Every pattern is compiled once at import
+- Dates and times come from a single finditer pass over the text
+- Each field is returned with a confidence in [0, 1]; run_extraction only
+  calls Groq for fields below RULES_CONFIDENCE_THRESHOLD
+"""
+
+import re
+from collections import namedtuple
+from datetime import date
+
+Ruled = namedtuple("Ruled", "value confidence")
+
+MONTHS = {m: i for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), start=1)}
+_MON = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+
+# one alternation = one pass over the text for every date/time shape we accept
+_DATETIME_TOKENS = re.compile(rf"""
+    (?P<iso>\b(?P<iy>\d{{4}})-(?P<im>\d{{1,2}})-(?P<id>\d{{1,2}})\b)
+  | (?P<dmy>\b(?P<d1>\d{{1,2}})[-/.](?P<m1>\d{{1,2}})[-/.](?P<y1>\d{{4}}|\d{{2}})\b)
+  | (?P<dmony>\b(?P<d2>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<mon2>{_MON})(?!\w),?\s+(?P<y2>\d{{4}})\b)
+  | (?P<mondy>\b(?P<mon3>{_MON})(?!\w)\s+(?P<d3>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<y3>\d{{4}})\b)
+  | (?P<hm>\b(?P<h1>[01]?\d|2[0-3]):(?P<mi1>[0-5]\d)(?:\s*(?P<ap1>[ap])\.?m\b\.?)?)
+  | (?P<hap>\b(?P<h2>1[0-2]|0?[1-9])\s*(?P<ap2>[ap])\.?m\b\.?)
+  | (?P<noon>\bnoon\b)
+""", re.IGNORECASE | re.VERBOSE)
+
+_FULL_DATE = re.compile(r"\s*(?:" + _DATETIME_TOKENS.pattern + r")\s*", re.IGNORECASE | re.VERBOSE)
+
+_HCP = re.compile(r"\b(?i:dr|prof|doctor)\.?\s+(?:[A-Z]\.\s*)?[A-Z][a-zA-Z\-']+")
+
+_SENTIMENT_OBSERVED = re.compile(
+    r"\bobserved\/inferred\s+hcp\s+sentiment\s*[:\-]?\s*(positive|negative|neutral)", re.IGNORECASE)
+_SENTIMENT_LABEL = re.compile(
+    r"\bsentiment\s*(?:was|is|[:\-])?\s*(positive|negative|neutral)\b"
+    r"|\b(positive|negative|neutral)\s+sentiment\b", re.IGNORECASE)
+_NEGATIVE = re.compile(
+    r"\b(negative|not interested|no interest|disliked|did not like|didn't like|skeptical|sceptical|"
+    r"unconvinced|concerns?|not (?:happy|satisfied|convinced))\b", re.IGNORECASE)
+_POSITIVE = re.compile(
+    r"\b(positive|liked|interested|good|favourable|favorable|keen|impressed|enthusiastic)\b", re.IGNORECASE)
+_NEUTRAL = re.compile(r"\bneutral\b", re.IGNORECASE)
+# a positive word after one of these in the same clause counts as negative ("did not find it good")
+_NEGATOR = re.compile(r"\b(?:not|no|never|didn't|don't|doesn't|wasn't|isn't|won't|hardly|without|nor)\b",
+                      re.IGNORECASE)
+_CLAUSE_BREAK = re.compile(r"[.,;!?]|\bbut\b", re.IGNORECASE)
+
+_MATERIALS = [
+    ("Brochure", re.compile(r"\bbrochures?\b", re.IGNORECASE)),
+    ("Leaflet", re.compile(r"\bleaflets?\b", re.IGNORECASE)),
+]
+_SAMPLES = re.compile(r"(\d+)\s*(?:samples|sample|vials|packs)", re.IGNORECASE)
+# "Materials shared: brochure, dosing card" / "Samples: 5 Glucobal" lines in templated notes
+_MATERIALS_LABEL = re.compile(r"\bmaterials?(?:\s+shared)?\s*(?::|\s-)\s*(.+?)(?:\n|$)", re.IGNORECASE)
+_SAMPLES_LABEL = re.compile(r"\bsamples?(?:\s+distributed)?\s*(?::|\s-)\s*(.+?)(?:\n|$)", re.IGNORECASE)
+_LIST_SPLIT = re.compile(r"\s*(?:,|;|\band\b)\s*", re.IGNORECASE)
+_TOPICS = re.compile(r"(?:discussed|about|regarding)\s+([A-Za-z0-9 \-,.&]+?)(?:\.|,|$)", re.IGNORECASE)
+_SUMMARY_LABEL = re.compile(r"\bsummary\s*[:\-]\s*(.+?)(?:\n|$)", re.IGNORECASE)
+_SENTENCE_END = re.compile(r"[.!?](?:\s|$)")
+
+
+def _year(text):
+    y = int(text)
+    if len(text) == 2:
+        y += 2000 if y < 69 else 1900  # same pivot as strptime %y
+    return y
+
+
+def _make_date(y, m, d):
+    try:
+        return date(y, m, d).isoformat()
+    except ValueError:
+        return None
+
+
+def _date_token(m):
+    """(iso_date, confidence) for a date match, or None."""
+    if m.group("iso"):
+        value = _make_date(int(m.group("iy")), int(m.group("im")), int(m.group("id")))
+        return (value, 0.97) if value else None
+    if m.group("dmony"):
+        value = _make_date(int(m.group("y2")), MONTHS[m.group("mon2")[:3].lower()], int(m.group("d2")))
+        return (value, 0.97) if value else None
+    if m.group("mondy"):
+        value = _make_date(int(m.group("y3")), MONTHS[m.group("mon3")[:3].lower()], int(m.group("d3")))
+        return (value, 0.95) if value else None
+    if m.group("dmy"):
+        d, mo, y = int(m.group("d1")), int(m.group("m1")), _year(m.group("y1"))
+        value = _make_date(y, mo, d)  # day-first, like normalize_date
+        if value:
+            # both parts <= 12 could be either order
+            return (value, 0.9 if d > 12 else 0.75)
+        value = _make_date(y, d, mo)  # only valid month-first
+        return (value, 0.6) if value else None
+    return None
+
+
+def _time_token(m):
+    """(HH:MM, confidence) for a time match, or None."""
+    if m.group("hm"):
+        h, mi, ap = int(m.group("h1")), int(m.group("mi1")), m.group("ap1")
+        if ap:
+            if h > 12:
+                return None
+            h = _to_24h(h, ap)
+        return f"{h:02d}:{mi:02d}", 0.95
+    if m.group("hap"):
+        return f"{_to_24h(int(m.group('h2')), m.group('ap2')):02d}:00", 0.95
+    if m.group("noon"):
+        return "12:00", 0.85
+    return None
+
+
+def _to_24h(h, ampm):
+    ampm = ampm.lower()
+    if ampm == "p" and h != 12:
+        return h + 12
+    if ampm == "a" and h == 12:
+        return 0
+    return h
+
+
+def _pick(candidates):
+    """One distinct value -> its best confidence; several distinct values -> ambiguous."""
+    if not candidates:
+        return Ruled(None, 0.0)
+    distinct = {}
+    for value, conf in candidates:
+        distinct[value] = max(conf, distinct.get(value, 0.0))
+    value, conf = max(distinct.items(), key=lambda kv: kv[1])
+    if len(distinct) > 1:
+        conf *= 0.5
+    return Ruled(value, conf)
+
+
+def scan_datetimes(text):
+    """Single pass over text; returns (date Ruled, time Ruled)."""
+    dates, times = [], []
+    for m in _DATETIME_TOKENS.finditer(text):
+        token = _date_token(m)
+        if token:
+            dates.append(token)
+            continue
+        token = _time_token(m)
+        if token:
+            times.append(token)
+    return _pick(dates), _pick(times)
+
+
+def parse_date(value):
+    """ISO date if value is exactly one recognised date token, else None."""
+    m = _FULL_DATE.fullmatch(str(value))
+    token = _date_token(m) if m else None
+    return token[0] if token else None
+
+
+def _negated(text, pos):
+    return bool(_NEGATOR.search(_CLAUSE_BREAK.split(text[:pos])[-1]))
+
+
+def sentiment(text):
+    """(Ruled label, "observed" | "inferred" | None); keyword hits are negation-aware."""
+    m = _SENTIMENT_OBSERVED.search(text)
+    if m:
+        return Ruled(m.group(1).capitalize(), 0.97), "observed"
+    m = _SENTIMENT_LABEL.search(text)
+    if m:
+        return Ruled((m.group(1) or m.group(2)).capitalize(), 0.9), "inferred"
+    pos, neg = False, bool(_NEGATIVE.search(text))
+    for m in _POSITIVE.finditer(text):
+        if _negated(text, m.start()):
+            neg = True
+        else:
+            pos = True
+    if pos and neg:
+        return Ruled(None, 0.0), None
+    if pos:
+        return Ruled("Positive", 0.8), "inferred"
+    if neg:
+        return Ruled("Negative", 0.8), "inferred"
+    if _NEUTRAL.search(text):
+        return Ruled("Neutral", 0.8), "inferred"
+    return Ruled(None, 0.0), None
+
+
+def _summary(text):
+    m = _SUMMARY_LABEL.search(text)
+    if m and m.group(1).strip():
+        return Ruled(m.group(1).strip(), 0.95)
+    stripped = text.strip()
+    # a short single-sentence note is already its own summary
+    if stripped and len(stripped) <= 160 and len(_SENTENCE_END.findall(stripped.rstrip(".!?"))) == 0:
+        return Ruled(stripped, 0.85)
+    return Ruled(None, 0.0)
+
+
+def _items(text, label, keyword_items):
+    """
+    An explicit "Materials: a, b" line is trusted; keyword hits are not, since
+    the note may name items the keyword list doesn't know ("two starter kits").
+    Empty or keyword-only lists stay below the threshold so the LLM tool runs.
+    """
+    m = label.search(text)
+    if m:
+        listed = [i.strip(" .") for i in _LIST_SPLIT.split(m.group(1)) if i.strip(" .")]
+        if listed and not any(i.lower() in ("none", "n/a", "-") for i in listed):
+            return Ruled(listed, 0.95)
+        return Ruled([], 0.95)
+    return Ruled(keyword_items, 0.6 if keyword_items else 0.0)
+
+
+def extract(text):
+    """
+    Resolve every field with rules only. Returns {field: Ruled(value, confidence)}
+    using the same field names and value shapes as run_extraction.
+    """
+    text = text or ""
+    out = {}
+
+    names = _pick([(m.group(0).strip(), 0.92) for m in _HCP.finditer(text)])
+    out["hcp_name"] = names
+
+    out["date"], out["time"] = scan_datetimes(text)
+
+    label, source = sentiment(text)
+    out["sentiment"] = label
+    out["sentiment_source"] = Ruled(source, label.confidence)
+
+    out["materials_shared"] = _items(text, _MATERIALS_LABEL, [name for name, p in _MATERIALS if p.search(text)])
+    out["samples_distributed"] = _items(text, _SAMPLES_LABEL, [f"{q} sample(s)" for q in _SAMPLES.findall(text)])
+    # topics need an explicit "discussed X" clause
+    m = _TOPICS.search(text)
+    topic = m.group(1).strip() if m else None
+    out["topics_discussed"] = Ruled(topic, 0.9 if topic and len(topic) <= 80 else 0.0)
+
+    out["summary"] = _summary(text)
+    return out
@@ -0,0 +1,160 @@
+"""
+Full-text search over raw_text, summary and topics_discussed
+- SQLite: FTS5 table interaction_fts (bm25 ranking, snippet()); each row carries the
+  interaction id (UNINDEXED) and an FTS rowid hashed from it, never the interaction
+  table's implicit rowid, which VACUUM may renumber
+- Postgres: tsvector column + GIN index (ts_rank ranking, ts_headline())
+- crud keeps the index in sync inside the same transaction as each write
+- setup() creates the index and backfills rows that are missing from it
+"""
+
+import os
+import re
+import hashlib
+import threading
+from sqlalchemy import text, bindparam
+from .database import engine
+
+SEARCH_ENABLED = os.getenv("SEARCH_ENABLED", "true").lower() in ("1", "true", "yes")
+SNIPPET_OPEN, SNIPPET_CLOSE = "<mark>", "</mark>"
+
+_state = {"backend": None}  # "sqlite" | "postgresql" | None (disabled/unavailable)
+_setup_lock = threading.Lock()
+
+_FTS_COLUMNS = ("interaction_id", "raw_text", "summary", "topics_discussed")
+_BACKFILL_BATCH = 1000
+
+_PG_DOCUMENT = (
+    "coalesce(raw_text, '') || ' ' || coalesce(summary, '') || ' ' || coalesce(topics_discussed, '')"
+)
+
+
+def setup():
+    """Create the index structures and backfill; safe to call repeatedly."""
+    with _setup_lock:
+        if not SEARCH_ENABLED:
+            return None
+        dialect = engine.dialect.name
+        try:
+            with engine.begin() as conn:
+                if dialect == "sqlite":
+                    _setup_fts5(conn)
+                elif dialect == "postgresql":
+                    conn.execute(text("ALTER TABLE interaction ADD COLUMN IF NOT EXISTS search_vector tsvector"))
+                    conn.execute(text(
+                        "CREATE INDEX IF NOT EXISTS ix_interaction_search_vector"
+                        " ON interaction USING GIN (search_vector)"
+                    ))
+                    conn.execute(text(
+                        f"UPDATE interaction SET search_vector = to_tsvector('english', {_PG_DOCUMENT})"
+                        " WHERE search_vector IS NULL"
+                    ))
+                else:
+                    return None
+        except Exception:
+            # e.g. SQLite built without FTS5: search stays disabled, writes are unaffected
+            _state["backend"] = None
+            return None
+        _state["backend"] = dialect
+        return dialect
+
+
+def _fts_rowid(interaction_id):
+    """Stable 63-bit FTS rowid for an interaction id."""
+    digest = hashlib.blake2b(str(interaction_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+
+def _fts_rows(rows):
+    return [{"rowid": _fts_rowid(r[0]), "interaction_id": r[0], "raw_text": r[1], "summary": r[2],
+             "topics_discussed": r[3]} for r in rows]
+
+
+_FTS_INSERT = text(
+    "INSERT INTO interaction_fts (rowid, interaction_id, raw_text, summary, topics_discussed)"
+    " VALUES (:rowid, :interaction_id, :raw_text, :summary, :topics_discussed)"
+)
+
+
+def _setup_fts5(conn):
+    columns = [r[1] for r in conn.execute(text("PRAGMA table_info(interaction_fts)"))]
+    if columns and tuple(columns) != _FTS_COLUMNS:
+        # older layout keyed by interaction.rowid: rebuild from scratch
+        conn.execute(text("DROP TABLE interaction_fts"))
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS interaction_fts USING fts5("
+        " interaction_id UNINDEXED, raw_text, summary, topics_discussed, tokenize='porter unicode61')"
+    ))
+    missing = conn.execute(text(
+        "SELECT id, raw_text, summary, topics_discussed FROM interaction"
+        " WHERE id NOT IN (SELECT interaction_id FROM interaction_fts)"
+    ))
+    while True:
+        batch = missing.fetchmany(_BACKFILL_BATCH)
+        if not batch:
+            break
+        conn.execute(_FTS_INSERT, _fts_rows(batch))
+
+
+def index_interactions(db, interaction_ids):
+    """Re-index the given rows using the caller's session/transaction."""
+    backend = _state["backend"]
+    ids = list(interaction_ids)
+    if not backend or not ids:
+        return
+    params = {"ids": ids}
+    if backend == "sqlite":
+        db.execute(text("DELETE FROM interaction_fts WHERE rowid IN :rowids").bindparams(
+            bindparam("rowids", expanding=True)), {"rowids": [_fts_rowid(i) for i in ids]})
+        rows = db.execute(text(
+            "SELECT id, raw_text, summary, topics_discussed FROM interaction WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)), params).all()
+        if rows:
+            db.execute(_FTS_INSERT, _fts_rows(rows))
+    else:
+        db.execute(text(
+            f"UPDATE interaction SET search_vector = to_tsvector('english', {_PG_DOCUMENT})"
+            " WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)), params)
+
+
+def index_interaction(db, interaction_id):
+    index_interactions(db, [interaction_id])
+
+
+def _fts5_query(q):
+    # quote every term so user input can't inject FTS5 syntax; terms are ANDed
+    terms = re.findall(r"\w+", q)
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def search_interactions(db, q, limit=20):
+    """
+    Ranked matches for q. Returns a list of (interaction_id, score, snippet),
+    best first; higher score is better on both backends.
+    """
+    backend = _state["backend"]
+    if not backend or not q or not q.strip():
+        return []
+
+    if backend == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return []
+        rows = db.execute(text(
+            "SELECT i.id, -bm25(interaction_fts, 0.0, 1.0, 2.0, 2.0) AS score,"
+            " snippet(interaction_fts, -1, :open, :close, '…', 12) AS snippet"
+            " FROM interaction_fts JOIN interaction i ON i.id = interaction_fts.interaction_id"
+            " WHERE interaction_fts MATCH :match"
+            " ORDER BY bm25(interaction_fts, 0.0, 1.0, 2.0, 2.0) LIMIT :limit"
+        ), {"match": match, "open": SNIPPET_OPEN, "close": SNIPPET_CLOSE, "limit": limit}).all()
+    else:
+        rows = db.execute(text(
+            "SELECT id, ts_rank(search_vector, query) AS score,"
+            f" ts_headline('english', {_PG_DOCUMENT}, query,"
+            "   'StartSel=' || :open || ', StopSel=' || :close || ', MaxWords=24, MinWords=8') AS snippet"
+            " FROM interaction, plainto_tsquery('english', :q) AS query"
+            " WHERE search_vector @@ query"
+            " ORDER BY score DESC LIMIT :limit"
+        ), {"q": q, "open": SNIPPET_OPEN, "close": SNIPPET_CLOSE, "limit": limit}).all()
+    return [(r[0], float(r[1]), r[2]) for r in rows]
@@ -0,0 +1,247 @@
+"""
+On-box sentiment classifier (hashed n-grams + multinomial logistic regression)
+- features: word unigrams and bigrams, with words after a negation marked
+  ("did not like it" -> not_like, not_it), hashed with crc32 into
+  SENTIMENT_FEATURES buckets; no vocabulary file, stable across processes
+- trained with plain NumPy SGD on interactions whose sentiment_source is
+  "observed"; the explicit "sentiment: X" phrase is stripped from the text
+  so the model learns from the rest of the note
+- the model file carries a format version and a model_version timestamp,
+  is written atomically and loaded once per process
+- numpy is optional: without it (or without a model file) predict() returns None
+
+CLI:  python -m app.sentiment_model train
+"""
+
+import os
+import re
+import json
+import zlib
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from . import logs, metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SENTIMENT_MODEL_PATH = os.getenv(
+    "SENTIMENT_MODEL_PATH", os.path.join(os.path.dirname(__file__), "sentiment_model.npz"))
+SENTIMENT_MODEL_THRESHOLD = float(os.getenv("SENTIMENT_MODEL_THRESHOLD", "0.7"))
+SENTIMENT_FEATURES = int(os.getenv("SENTIMENT_FEATURES", str(2 ** 18)))
+
+FORMAT_VERSION = 1
+LABELS = ("Positive", "Neutral", "Negative")
+
+_TOKEN = re.compile(r"[a-z0-9']+|[.!?;,]")
+_NEGATORS = {"not", "no", "never", "didn't", "don't", "doesn't", "wasn't", "isn't", "won't", "couldn't",
+             "hardly", "without", "nor"}
+_CLAUSE_END = {".", "!", "?", ";", ","}
+# explicit labels would let the model learn the answer instead of the note
+_EXPLICIT_LABEL = re.compile(
+    r"(?:observed\s*/\s*inferred\s+)?(?:hcp\s+)?sentiment\s*(?:was|is|[:\-])?\s*(?:positive|negative|neutral)\b"
+    r"|\b(?:positive|negative|neutral)\s+sentiment\b", re.IGNORECASE)
+
+
+def tokens(text):
+    out, negated = [], False
+    for tok in _TOKEN.findall((text or "").lower()):
+        if tok in _CLAUSE_END:
+            negated = False
+            continue
+        out.append("not_" + tok if negated else tok)
+        if tok in _NEGATORS:
+            negated = True
+    return out
+
+
+def features(text, n_features=SENTIMENT_FEATURES):
+    """(indices, values) of the L2-normalized hashed n-gram vector."""
+    toks = tokens(text)
+    grams = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+    counts = {}
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        idx = h % n_features
+        counts[idx] = counts.get(idx, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    val = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = float(np.linalg.norm(val))
+    return idx, val / norm if norm else val
+
+
+def training_text(text):
+    return _EXPLICIT_LABEL.sub(" ", text or "")
+
+
+class SentimentModel:
+    def __init__(self, weights, bias, n_features, model_version, n_examples=0):
+        self.weights = weights            # (labels, n_features) float32
+        self.bias = bias                  # (labels,) float32
+        self.n_features = n_features
+        self.model_version = model_version
+        self.n_examples = n_examples
+
+    def probabilities(self, text):
+        idx, val = features(text, self.n_features)
+        logits = self.weights[:, idx] @ val + self.bias
+        logits = logits - logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def predict(self, text):
+        """(label, confidence)."""
+        probs = self.probabilities(text)
+        best = int(probs.argmax())
+        return LABELS[best], float(probs[best])
+
+    def save(self, path):
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp, weights=self.weights, bias=self.bias,
+            meta=np.array(json.dumps({
+                "format_version": FORMAT_VERSION, "model_version": self.model_version,
+                "n_features": self.n_features, "labels": list(LABELS), "n_examples": self.n_examples,
+            })),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("format_version") != FORMAT_VERSION or tuple(meta.get("labels", ())) != LABELS:
+                raise ValueError(f"unsupported sentiment model format: {meta}")
+            return cls(data["weights"].astype(np.float32), data["bias"].astype(np.float32),
+                       int(meta["n_features"]), meta["model_version"], meta.get("n_examples", 0))
+
+
+def train(examples, n_features=SENTIMENT_FEATURES, epochs=10, lr=0.5, l2=1e-5, seed=0):
+    """
+    Multinomial logistic regression by SGD over sparse hashed features.
+    examples: [(text, label)] with labels from LABELS.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.zeros((len(LABELS), n_features), dtype=np.float32)
+    bias = np.zeros(len(LABELS), dtype=np.float32)
+    data = [(features(training_text(t), n_features), LABELS.index(y)) for t, y in examples]
+    for epoch in range(epochs):
+        step = lr / (1.0 + epoch)
+        for i in rng.permutation(len(data)):
+            (idx, val), y = data[i]
+            logits = weights[:, idx] @ val + bias
+            probs = np.exp(logits - logits.max())
+            probs /= probs.sum()
+            probs[y] -= 1.0                                   # gradient of the log loss
+            weights[:, idx] -= step * (np.outer(probs, val) + l2 * weights[:, idx])
+            bias -= step * probs
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    return SentimentModel(weights, bias, n_features, version, len(data))
+
+
+# ---------------------------
+# Process-wide model (loaded once)
+# ---------------------------
+_state = {"model": None, "loaded": False}
+_lock = threading.Lock()
+
+
+def get_model():
+    """The loaded model, or None when numpy or the model file is missing."""
+    if _state["loaded"]:
+        return _state["model"]
+    with _lock:
+        if not _state["loaded"]:
+            model = None
+            if np is not None and os.path.exists(SENTIMENT_MODEL_PATH):
+                try:
+                    model = SentimentModel.load(SENTIMENT_MODEL_PATH)
+                except Exception as e:
+                    logs.get_logger("sentiment_model").warning(f"sentiment model not loaded: {e!r}")
+            _state["model"], _state["loaded"] = model, True
+    return _state["model"]
+
+
+def reload():
+    with _lock:
+        _state["loaded"] = False
+    return get_model()
+
+
+def predict(text, threshold=None):
+    """(label, confidence) when the model is confident enough, else None."""
+    model = get_model()
+    if model is None or not text:
+        return None
+    label, confidence = model.predict(text)
+    if confidence < (SENTIMENT_MODEL_THRESHOLD if threshold is None else threshold):
+        metrics.SENTIMENT_MODEL.inc(outcome="below_threshold")
+        return None
+    metrics.SENTIMENT_MODEL.inc(outcome="accepted")
+    return label, confidence
+
+
+# ---------------------------
+# Training CLI
+# ---------------------------
+def load_examples(db):
+    from .models import Interaction
+    rows = (db.query(Interaction.raw_text, Interaction.sentiment)
+            .filter(Interaction.sentiment_source == "observed", Interaction.sentiment.in_(LABELS),
+                    Interaction.raw_text.isnot(None))
+            .all())
+    return [(text, label) for text, label in rows if text.strip()]
+
+
+def main(argv=None):
+    from .database import SessionLocal, sync_schema
+    from . import models
+
+    parser = argparse.ArgumentParser(description="Train the local sentiment classifier.")
+    parser.add_argument("command", choices=("train",))
+    parser.add_argument("--path", default=SENTIMENT_MODEL_PATH)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--lr", type=float, default=0.5)
+    parser.add_argument("--holdout", type=float, default=0.1, help="fraction kept aside for accuracy")
+    parser.add_argument("--min-examples", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("numpy is required for training (pip install numpy)")
+    sync_schema(models.Base.metadata)
+    db = SessionLocal()
+    try:
+        examples = load_examples(db)
+    finally:
+        db.close()
+    if len(examples) < args.min_examples:
+        parser.error(f"only {len(examples)} observed examples; need --min-examples {args.min_examples}")
+
+    order = np.random.default_rng(1).permutation(len(examples))
+    n_holdout = int(len(examples) * args.holdout)
+    holdout = [examples[i] for i in order[:n_holdout]]
+    trainset = [examples[i] for i in order[n_holdout:]]
+
+    started = time.perf_counter()
+    model = train(trainset, epochs=args.epochs, lr=args.lr)
+    elapsed = time.perf_counter() - started
+    accuracy = None
+    if holdout:
+        hits = sum(model.predict(training_text(t))[0] == y for t, y in holdout)
+        accuracy = round(hits / len(holdout), 4)
+    model.save(args.path)
+    stats = {"command": args.command, "path": args.path, "model_version": model.model_version,
+             "examples": len(trainset), "holdout": len(holdout), "holdout_accuracy": accuracy,
+             "train_s": round(elapsed, 3)}
+    print(json.dumps(stats))
+    return stats
+
+
+if __name__ == "__main__":
+    main()
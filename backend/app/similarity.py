@@ -0,0 +1,344 @@
+"""
+"Similar past interactions" index
+- embed(): signed hashing vectorizer over word uni/bigrams of summary +
+  topics_discussed (raw_text when both are empty), L2-normalized float32
+- storage: SIMILARITY_DIR/vectors.f32 (row-major float32, SIMILARITY_DIM wide)
+  and ids.s36 (fixed-width interaction ids), both append-only and memory-mapped;
+  the row count is derived from the file sizes so a torn append is ignored
+- several processes may share the directory (uvicorn --workers, the ingest
+  CLI): appends and clears hold an flock on index.lock, and every search or
+  append first picks up rows other processes added (a clear/rebuild replaces
+  the files, which is noticed by inode); without fcntl run a single writer
+- crud appends after each commit; a re-embedded interaction gets a new row
+  and its older rows are masked out of search
+- search(): one mat-vec over the mapped matrix + argpartition top-k; exact
+  matches of a query text (the note itself, already indexed) are skipped
+- numpy is optional: without it the index is disabled and search returns []
+
+CLI:  python -m app.similarity rebuild
+"""
+
+import os
+import re
+import json
+import zlib
+import argparse
+import threading
+from contextlib import contextmanager
+from . import logs
+
+try:
+    import fcntl
+except ImportError:         # Windows: no cross-process lock, keep to a single writer
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_DIR = os.getenv("SIMILARITY_DIR", os.path.join(os.path.dirname(__file__), "similarity_index"))
+SIMILARITY_DIM = int(os.getenv("SIMILARITY_DIM", "128"))   # 128 floats = 512 bytes per interaction
+
+FORMAT_VERSION = 1
+ID_WIDTH = 36               # uuid4 string
+logger = logs.get_logger("similarity")
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9\-]+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "was", "were", "are", "had", "has", "have", "his", "her", "she",
+    "him", "they", "them", "this", "that", "about", "on", "in", "of", "to", "at", "an", "it",
+    "is", "be", "as", "by", "dr", "met", "meeting", "discussed", "hcp",
+}
+
+
+def document(fields):
+    """Text that represents an Interaction (or dict of its columns) in the index."""
+    get = fields.get if isinstance(fields, dict) else (lambda k: getattr(fields, k, None))
+    text = " ".join(v for v in (get("summary"), get("topics_discussed")) if v)
+    return text or get("raw_text") or ""
+
+
+def embed(text, dim=SIMILARITY_DIM):
+    """L2-normalized hashed vector; all zeros when text has no usable words."""
+    vec = np.zeros(dim, dtype=np.float32)
+    words = [w for w in _WORD.findall((text or "").lower()) if w not in _STOPWORDS]
+    for gram in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = zlib.crc32(gram.encode("utf-8"))
+        vec[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else vec
+
+
+class VectorIndex:
+    def __init__(self, directory=SIMILARITY_DIR, dim=SIMILARITY_DIM):
+        self.dir = directory
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.s36")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, "index.lock")
+        self.count = 0
+        self._inode = None         # ids.s36 inode the rows below were read from
+        self._vectors = None       # np.memmap (count, dim) float32
+        self._ids = None           # np.memmap (count,) S36
+        self._latest = {}          # interaction id -> newest row
+        self._stale = np.zeros(0, dtype=bool)
+        self._open()
+
+    @contextmanager
+    def _writing(self):
+        """Thread lock plus, where available, an exclusive flock shared with other processes."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _open(self):
+        os.makedirs(self.dir, exist_ok=True)
+        with self._writing():
+            meta = {}
+            if os.path.exists(self._meta_path):
+                with open(self._meta_path) as f:
+                    meta = json.load(f)
+            if meta != {"format_version": FORMAT_VERSION, "dim": self.dim} \
+                    or not os.path.exists(self._ids_path) or not os.path.exists(self._vectors_path):
+                # new, or built with another dimension/format: start empty
+                self._reset_files()
+            row_bytes = self.dim * 4
+            count = min(os.path.getsize(self._vectors_path) // row_bytes,
+                        os.path.getsize(self._ids_path) // ID_WIDTH)
+            # drop a partially written tail (safe: no other writer holds the lock)
+            for path, width in ((self._vectors_path, row_bytes), (self._ids_path, ID_WIDTH)):
+                if os.path.getsize(path) != count * width:
+                    with open(path, "r+b") as f:
+                        f.truncate(count * width)
+            self._refresh()
+
+    def _reset_files(self):
+        # fresh files swapped in, so other processes see a new inode and re-read
+        for path in (self._vectors_path, self._ids_path):
+            open(f"{path}.tmp", "wb").close()
+            os.replace(f"{path}.tmp", path)
+        with open(self._meta_path, "w") as f:
+            json.dump({"format_version": FORMAT_VERSION, "dim": self.dim}, f)
+
+    def _refresh(self):
+        """Pick up rows appended (or a rebuild done) by any process since the last look. Caller holds _lock."""
+        try:
+            inode = os.stat(self._ids_path).st_ino
+            count = min(os.path.getsize(self._vectors_path) // (self.dim * 4),
+                        os.path.getsize(self._ids_path) // ID_WIDTH)
+        except FileNotFoundError:
+            return
+        if inode != self._inode or count < self.count:
+            self._inode, self.count = inode, 0
+            self._latest, self._stale = {}, np.zeros(0, dtype=bool)
+            self._vectors = self._ids = None
+        if count == self.count:
+            return
+        new_ids = np.fromfile(self._ids_path, dtype=f"S{ID_WIDTH}", count=count - self.count,
+                              offset=self.count * ID_WIDTH)
+        self._stale = np.concatenate([self._stale, np.zeros(len(new_ids), dtype=bool)])
+        for row, raw in enumerate(new_ids, start=self.count):
+            key = raw.decode("ascii")
+            if key in self._latest:
+                self._stale[self._latest[key]] = True
+            self._latest[key] = row
+        self.count = count
+        self._remap()
+
+    def _remap(self):
+        if self.count:
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            self._ids = np.memmap(self._ids_path, dtype=f"S{ID_WIDTH}", mode="r", shape=(self.count,))
+        else:
+            self._vectors, self._ids = None, None
+
+    def add_many(self, items):
+        """Append (interaction_id, vector) pairs; zero vectors are skipped."""
+        items = [(i, v) for i, v in items if i and v is not None and v.any()]
+        if not items:
+            return 0
+        ids = np.array([i.encode("ascii")[:ID_WIDTH] for i, _ in items], dtype=f"S{ID_WIDTH}")
+        vectors = np.vstack([v for _, v in items]).astype(np.float32, copy=False)
+        with self._writing():
+            # ids last: a crash between the writes leaves an extra vector, which _open drops
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._ids_path, "ab") as f:
+                f.write(ids.tobytes())
+            self._refresh()
+        return len(items)
+
+    def search(self, vector, k=5, exclude=()):
+        """[(interaction_id, cosine)] best first, skipping superseded rows and exclude."""
+        with self._lock:
+            self._refresh()
+            vectors, ids, stale, count = self._vectors, self._ids, self._stale, self.count
+        if not count or vector is None or not vector.any():
+            return []
+        scores = vectors @ vector
+        scores[stale[:count]] = -np.inf
+        want = min(count, k + len(exclude))
+        top = np.argpartition(-scores, want - 1)[:want]
+        top = top[np.argsort(-scores[top])]
+        out = []
+        for row in top:
+            key = ids[row].decode("ascii")
+            if key in exclude or not np.isfinite(scores[row]):
+                continue
+            out.append((key, float(scores[row])))
+            if len(out) >= k:
+                break
+        return out
+
+    def vector_for(self, interaction_id):
+        with self._lock:
+            self._refresh()
+            row = self._latest.get(interaction_id)
+            return None if row is None else np.array(self._vectors[row])
+
+    def clear(self):
+        with self._writing():
+            self._reset_files()
+            self._refresh()
+
+
+_state = {"index": None}
+_state_lock = threading.Lock()
+
+
+def get_index():
+    """Process-wide index, opened on first use; None when disabled or numpy is missing."""
+    if not SIMILARITY_ENABLED or np is None:
+        return None
+    with _state_lock:
+        if _state["index"] is None:
+            _state["index"] = VectorIndex()
+        return _state["index"]
+
+
+def index_interactions(objs):
+    """Embed and append committed interactions. Never raises: the write already succeeded."""
+    try:
+        index = get_index()
+        if index is not None:
+            index.add_many([(o.id if not isinstance(o, dict) else o["id"], embed(document(o))) for o in objs])
+    except Exception as e:
+        logger.warning(f"similarity index append failed: {e!r}")
+
+
+def similar_to_text(text, k=5, exclude=()):
+    """Neighbours of free text; pass the note's own id in exclude when it is already indexed."""
+    index = get_index()
+    if index is None:
+        return []
+    return index.search(embed(text), k=k, exclude=set(exclude))
+
+
+def similar_to_interaction(obj, k=5):
+    index = get_index()
+    if index is None:
+        return []
+    vector = index.vector_for(obj.id)
+    if vector is None:
+        vector = embed(document(obj))
+    return index.search(vector, k=k, exclude={obj.id})
+
+
+def rebuild(db, batch_size=1000):
+    """Re-embed every interaction from the database. Returns rows indexed."""
+    from .models import Interaction
+    index = get_index()
+    if index is None:
+        return 0
+    index.clear()
+    indexed, batch = 0, []
+    cols = (Interaction.id, Interaction.summary, Interaction.topics_discussed, Interaction.raw_text)
+    for row in db.query(*cols).order_by(Interaction.created_at).yield_per(batch_size):
+        batch.append(dict(row._mapping))
+        if len(batch) >= batch_size:
+            indexed += index.add_many([(r["id"], embed(document(r))) for r in batch])
+            batch = []
+    indexed += index.add_many([(r["id"], embed(document(r))) for r in batch])
+    return indexed
+
+
+def setup():
+    """Build the index on first start when it is empty but interactions exist."""
+    index = get_index()
+    if index is None or index.count:
+        return
+    from .database import SessionLocal
+    from .models import Interaction
+    db = SessionLocal()
+    try:
+        if db.query(Interaction.id).first() is not None:
+            rebuild(db)
+    finally:
+        db.close()
+
+
+# ---------------------------
+# Next-best-action from neighbours
+# ---------------------------
+def neighbor_actions(neighbors, limit=3):
+    """
+    Suggestions from similar past interactions: outcomes and items that went
+    with Positive neighbours, weighted by similarity.
+    neighbors: [(Interaction, score)].
+    """
+    votes = {}
+
+    def vote(action, weight, interaction_id):
+        entry = votes.setdefault(action, {"action": action, "score": 0.0, "evidence": []})
+        entry["score"] += weight
+        entry["evidence"].append(interaction_id)
+
+    for obj, score in neighbors:
+        if score <= 0 or obj.sentiment != "Positive":
+            continue
+        if obj.outcomes:
+            vote(f"Follow the approach that led to: {obj.outcomes.strip()[:160]}", score, obj.id)
+        for item in (obj.materials_shared or []) + (obj.samples_distributed or []):
+            vote(f"Share {item}", score, obj.id)
+        if obj.follow_up_date:
+            vote("Schedule a follow-up meeting", score, obj.id)
+    ranked = sorted(votes.values(), key=lambda v: -v["score"])[:limit]
+    for entry in ranked:
+        entry["score"] = round(entry["score"], 4)
+    return ranked
+
+
+def main(argv=None):
+    from .database import SessionLocal, sync_schema
+    from . import models
+
+    parser = argparse.ArgumentParser(description="Maintain the similar-interactions vector index.")
+    parser.add_argument("command", choices=("rebuild",))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("numpy is required for the similarity index (pip install numpy)")
+    sync_schema(models.Base.metadata)
+    db = SessionLocal()
+    try:
+        indexed = rebuild(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    print(json.dumps({"command": args.command, "indexed": indexed, "dim": SIMILARITY_DIM}))
+    return indexed
+
+
+if __name__ == "__main__":
+    main()
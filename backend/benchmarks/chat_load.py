@@ -0,0 +1,81 @@
+"""
+Concurrent load benchmark for POST /api/interactions/chat
+
+Fires a fixed number of requests at each concurrency level and reports
+throughput and latency percentiles as JSON, so you can check that
+throughput grows with in-flight requests instead of serializing.
+
+    uvicorn app.main:app --port 8000
+    python -m benchmarks.chat_load --url http://127.0.0.1:8000 --levels 1,4,16 --requests 64
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+SAMPLE_NOTE = (
+    "Met Dr. Smith on 12th Jan 2025 at 2 pm, discussed Product-X efficacy, "
+    "positive sentiment, shared brochure and 5 samples."
+)
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_level(url, concurrency, total, text=SAMPLE_NOTE, timeout=120, texts=None):
+    """texts: optional list of notes cycled through instead of repeating text."""
+    session = requests.Session()
+    endpoint = url.rstrip("/") + "/api/interactions/chat"
+
+    def one(i):
+        note = texts[i % len(texts)] if texts else text
+        t0 = time.perf_counter()
+        try:
+            ok = session.post(endpoint, json={"text": note}, timeout=timeout).status_code == 200
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [lat for ok, lat in results if ok]
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": sum(1 for ok, _ in results if not ok),
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "latency_mean_s": statistics.mean(latencies) if latencies else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--levels", default="1,2,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per level")
+    args = parser.parse_args(argv)
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    report = {"url": args.url, "levels": [run_level(args.url, c, args.requests) for c in levels]}
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
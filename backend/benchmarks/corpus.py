@@ -0,0 +1,93 @@
+"""
+Synthetic HCP call notes for benchmarks
+Deterministic for a given seed; mixes templated notes (what reps usually
+write, mostly resolvable by rules) with free-form ones that need the LLM.
+"""
+
+import random
+
+SURNAMES = ["Smith", "Rao", "Potdar", "Iyer", "Chen", "Garcia", "Okafor", "Müller", "Haddad", "Novak"]
+TITLES = ["Dr.", "Dr", "Prof."]
+PRODUCTS = ["Product-X", "Product-Y", "Cardiozen", "Glucobal", "Neurolix"]
+TOPICS = ["efficacy", "dosing", "side effects", "pricing", "trial data", "patient adherence"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+SENTIMENTS = [
+    "positive sentiment", "was very interested", "neutral sentiment",
+    "not interested at the moment", "raised concerns about cost", "liked the data",
+]
+MATERIALS = ["shared brochure", "left a leaflet", "shared brochure and leaflet", ""]
+FILLER = [
+    "Clinic was busy and the meeting was cut short.",
+    "Follow-up requested in two weeks.",
+    "Nurse manager also joined for part of the call.",
+    "Asked for the latest publication on long-term outcomes.",
+]
+
+
+def _date(rng):
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.choice([2024, 2025])
+    return rng.choice([
+        f"{day}th {MONTHS[month - 1]} {year}",
+        f"{year}-{month:02d}-{day:02d}",
+        f"{day:02d}-{month:02d}-{year}",
+        f"{MONTHS[month - 1]} {day}, {year}",
+    ])
+
+
+def _time(rng):
+    hour = rng.randint(8, 18)
+    return rng.choice([f"{hour}:{rng.choice(['00', '15', '30', '45'])}", f"{(hour - 1) % 12 + 1} {'pm' if hour >= 12 else 'am'}"])
+
+
+def make_note(rng):
+    name = f"{rng.choice(TITLES)} {rng.choice(SURNAMES)}"
+    product, topic = rng.choice(PRODUCTS), rng.choice(TOPICS)
+    samples = rng.choice(["", f" and {rng.randint(1, 12)} samples"])
+    materials = rng.choice(MATERIALS)
+    if rng.random() < 0.7:
+        note = (f"Met {name} on {_date(rng)} at {_time(rng)}, discussed {product} {topic}, "
+                f"{rng.choice(SENTIMENTS)}, {materials}{samples}.")
+    else:
+        note = (f"Quick catch-up with {name} today. We went over {product} and the {topic} questions "
+                f"from last time. {rng.choice(FILLER)} {rng.choice(SENTIMENTS).capitalize()}.")
+    return " ".join(note.replace(", ,", ",").replace(", .", ".").split())
+
+
+def generate(n, seed=7):
+    rng = random.Random(seed)
+    return [make_note(rng) for _ in range(n)]
+
+
+def corrections(stored, seed=11):
+    """
+    One correction per stored interaction (dicts as returned by the status
+    endpoint), always different from what is stored so the edit must change
+    something: [(text, field, expected stored value)].
+    """
+    rng = random.Random(seed)
+
+    def time_fix(row):
+        hour = rng.choice([h for h in range(8, 19) if f"{h:02d}:00" != row["time"]])
+        return f"actually it was {(hour - 1) % 12 + 1} {'pm' if hour >= 12 else 'am'}", "time", f"{hour:02d}:00"
+
+    def date_fix(row):
+        while True:
+            day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.choice([2024, 2025])
+            iso = f"{year}-{month:02d}-{day:02d}"
+            if iso != row["date"]:
+                return f"date should be {day} {MONTHS[month - 1]} {year}", "date", iso
+
+    def samples_fix(row):
+        n = rng.choice([n for n in range(1, 7) if [f"{n} sample(s)"] != row["samples_distributed"]])
+        return f"also shared {n} samples", "samples_distributed", [f"{n} sample(s)"]
+
+    def sentiment_fix(row):
+        label = rng.choice([s for s in ("Positive", "Neutral", "Negative") if s != row["sentiment"]])
+        return f"sentiment was {label.lower()}", "sentiment", label
+
+    def name_fix(row):
+        name = rng.choice([f"Dr. {s}" for s in SURNAMES if f"Dr. {s}" != row["hcp_name"]])
+        return f"it was {name}, not the other one", "hcp_name", name
+
+    templates = [time_fix, date_fix, samples_fix, sentiment_fix, name_fix]
+    return [rng.choice(templates)(row) for row in stored]
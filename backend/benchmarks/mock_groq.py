@@ -0,0 +1,126 @@
+"""
+Local stand-in for the Groq chat-completions API
+- Configurable latency (mean + jitter), 5xx error rate and 429 rate (with Retry-After)
+- Answers with plausible JSON for each extraction prompt, derived from the
+  note with app.rules, plus a usage block, so the whole pipeline runs offline
+
+    python -m benchmarks.mock_groq --port 9900 --latency-ms 300 --error-rate 0.02 --rate-limit-rate 0.05
+"""
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from app import rules
+
+
+def _answer(messages):
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    note = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    ruled = {k: v.value for k, v in rules.extract(note).items()}
+    summary = ruled["summary"] or note.split(".")[0][:160]
+    full = {
+        "hcp_name": ruled["hcp_name"], "date": ruled["date"], "time": ruled["time"],
+        "sentiment": ruled["sentiment"] or "Neutral",
+        "materials_shared": ruled["materials_shared"], "samples_distributed": ruled["samples_distributed"],
+        "topics_discussed": ruled["topics_discussed"], "summary": summary,
+    }
+    s = system.lower()
+    if '"fields"' in s:
+        return {"fields": [k for k in ("hcp_name", "date", "time") if full[k]] or ["summary"]}
+    if "interaction details" in s:
+        return full
+    if "materials_shared" in s:
+        return {k: full[k] for k in ("materials_shared", "samples_distributed", "topics_discussed")}
+    for key in ("hcp_name", "date", "time", "sentiment", "summary"):
+        if key in s:
+            return {key: full[key]}
+    return {"reply": "pong"}
+
+
+def make_handler(latency_ms=200.0, jitter_ms=50.0, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # keep-alive: headers and body are separate writes, and Nagle + delayed ACK
+        # would hold the body back ~40ms on every pooled call
+        disable_nagle_algorithm = True
+        wbufsize = -1                   # buffer the response; flushed once per request
+
+        def _send(self, status, body, headers=None):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            with lock:
+                stats["requests"] += 1
+                roll = rng.random()
+                delay = max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000.0
+            if roll < rate_limit_rate:
+                with lock:
+                    stats["rate_limited"] += 1
+                return self._send(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0.2"})
+            time.sleep(delay)
+            if roll < rate_limit_rate + error_rate:
+                with lock:
+                    stats["errors"] += 1
+                return self._send(500, {"error": {"message": "mock failure"}})
+
+            messages = payload.get("messages", [])
+            content = json.dumps(_answer(messages))
+            prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+            self._send(200, {
+                "id": f"mock-{stats['requests']}",
+                "object": "chat.completion",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                          "total_tokens": prompt_tokens + len(content) // 4},
+            })
+
+        def log_message(self, *args):
+            pass
+
+    Handler.stats = stats
+    return Handler
+
+
+def start(port=0, **options):
+    """Start the mock on a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(**options))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/openai/v1/chat/completions"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock Groq chat-completions server.")
+    parser.add_argument("--port", type=int, default=9900)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    server, url = start(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    print(f"mock Groq listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
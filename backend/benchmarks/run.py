@@ -0,0 +1,241 @@
+"""
+Offline benchmark suite for the extraction pipeline and DB layer
+
+Starts a mock Groq server and the API in-process against a throwaway SQLite
+database, runs the scenarios and prints machine-readable JSON.
+
+    python -m benchmarks.run                                  # all scenarios
+    python -m benchmarks.run --scenarios single,edit --latency-ms 50
+    python -m benchmarks.run --output bench.json --baseline main.json --tolerance 0.2
+
+Scenarios:
+    single      sequential run_extraction latency per note
+    concurrent  POST /api/interactions/chat throughput at several concurrency levels
+    bulk        app.ingest throughput over a JSONL corpus
+    edit        POST /api/interactions/edit/{id} latency; every edit must change its field
+Exits 1 when an edit changed nothing ("failures" in the edit results) and,
+with --baseline, if any p50/p95 latency grew (or throughput fell) by more
+than --tolerance.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+
+from . import corpus, mock_groq
+from .chat_load import run_level, _percentile
+
+SCENARIOS = ("single", "concurrent", "bulk", "edit")
+
+
+def _configure_env(args, workdir, groq_url):
+    # must run before any app module is imported: they read config at import time
+    os.environ.update({
+        "GROQ_API_URL": groq_url,
+        "GROQ_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LOG_PATH": os.path.join(workdir, "bench.log"),
+        "SIMILARITY_DIR": os.path.join(workdir, "similarity_index"),
+        "LLM_CACHE_ENABLED": "true" if args.cache else "false",
+        "GROQ_RPM": "0",
+    })
+    for pair in args.env or []:
+        key, _, value = pair.partition("=")
+        os.environ[key] = value
+
+
+def _latency_summary(latencies):
+    return {
+        "n": len(latencies),
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "mean_s": statistics.mean(latencies) if latencies else None,
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_api():
+    import uvicorn
+    from app.main import app
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 15
+    while not server.started and time.time() < deadline:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def scenario_single(notes):
+    from app import langgraph_tools
+
+    latencies = []
+    for note in notes:
+        t0 = time.perf_counter()
+        langgraph_tools.run_extraction(note)
+        latencies.append(time.perf_counter() - t0)
+    return _latency_summary(latencies)
+
+
+def scenario_concurrent(base_url, notes, levels, per_level):
+    return {"levels": [run_level(base_url, c, per_level, texts=notes) for c in levels]}
+
+
+def scenario_bulk(notes, chunk_size, concurrency):
+    from app import ingest
+
+    stream = io.StringIO("".join(json.dumps({"text": n}) + "\n" for n in notes))
+    return ingest.ingest(stream, "jsonl", chunk_size=chunk_size, concurrency=concurrency)
+
+
+def scenario_edit(base_url, notes, n, seed):
+    """
+    Edit latency, checking every edit really changed the corrected field:
+    a 200 response, the field in changed_fields and the new value stored.
+    """
+    import requests
+
+    session = requests.Session()
+    ids = [session.post(f"{base_url}/api/interactions/chat", json={"text": note}).json()["interaction_id"]
+           for note in notes[:n]]
+    stored = [session.get(f"{base_url}/api/interactions/{i}/status").json() for i in ids]
+    latencies, failures = [], []
+    for interaction_id, (correction, field, expected) in zip(ids, corpus.corrections(stored, seed=seed)):
+        t0 = time.perf_counter()
+        resp = session.post(f"{base_url}/api/interactions/edit/{interaction_id}", json={"text": correction})
+        latencies.append(time.perf_counter() - t0)
+        problem = None
+        if resp.status_code != 200:
+            problem = f"status {resp.status_code}"
+        elif field not in resp.json().get("changed_fields", []):
+            problem = f"changed_fields {resp.json().get('changed_fields')}"
+        else:
+            now = session.get(f"{base_url}/api/interactions/{interaction_id}/status").json().get(field)
+            if now != expected:
+                problem = f"stored {now!r}"
+        if problem:
+            failures.append({"interaction_id": interaction_id, "correction": correction, "field": field,
+                             "expected": expected, "problem": problem})
+    return dict(_latency_summary(latencies), failures=failures)
+
+
+def compare(results, baseline, tolerance):
+    """List of human-readable regressions versus a previous results file."""
+    regressions = []
+
+    def check(path, new, old, higher_is_worse=True):
+        if new is None or old in (None, 0):
+            return
+        change = (new - old) / old
+        if (change > tolerance) if higher_is_worse else (-change > tolerance):
+            regressions.append(f"{path}: {old:.4f} -> {new:.4f} ({change:+.0%})")
+
+    for name in ("single", "edit"):
+        new, old = results["scenarios"].get(name), baseline.get("scenarios", {}).get(name)
+        if new and old:
+            for key in ("p50_s", "p95_s"):
+                check(f"{name}.{key}", new.get(key), old.get(key))
+    new, old = results["scenarios"].get("concurrent"), baseline.get("scenarios", {}).get("concurrent")
+    if new and old:
+        old_levels = {lvl["concurrency"]: lvl for lvl in old["levels"]}
+        for lvl in new["levels"]:
+            prev = old_levels.get(lvl["concurrency"])
+            if prev:
+                check(f"concurrent[{lvl['concurrency']}].throughput_rps",
+                      lvl["throughput_rps"], prev["throughput_rps"], higher_is_worse=False)
+                check(f"concurrent[{lvl['concurrency']}].latency_p95_s", lvl["latency_p95_s"], prev["latency_p95_s"])
+    new, old = results["scenarios"].get("bulk"), baseline.get("scenarios", {}).get("bulk")
+    if new and old:
+        check("bulk.notes_per_s", new.get("notes_per_s"), old.get("notes_per_s"), higher_is_worse=False)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline HCP extraction benchmarks.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--notes", type=int, default=40, help="corpus size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--levels", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=32, help="requests per concurrency level")
+    parser.add_argument("--chunk-size", type=int, default=50)
+    parser.add_argument("--bulk-concurrency", type=int, default=8)
+    parser.add_argument("--cache", action="store_true", help="leave the LLM cache on")
+    parser.add_argument("--env", action="append", metavar="KEY=VALUE",
+                        help="extra app settings, e.g. EXTRACTION_STRATEGY=combined")
+    parser.add_argument("--output", help="also write results to this file")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in args.scenarios.split(",") if s in SCENARIOS]
+    mock, groq_url = mock_groq.start(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                     error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                                     seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="hcp-bench-")
+    _configure_env(args, workdir, groq_url)
+
+    notes = corpus.generate(args.notes, seed=args.seed)
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "scenarios": {},
+    }
+
+    server = base_url = None
+    if {"concurrent", "edit"} & set(scenarios):
+        server, base_url = _start_api()
+
+    try:
+        if "single" in scenarios:
+            results["scenarios"]["single"] = scenario_single(notes)
+        if "concurrent" in scenarios:
+            levels = [int(x) for x in args.levels.split(",") if x.strip()]
+            results["scenarios"]["concurrent"] = scenario_concurrent(base_url, notes, levels, args.requests)
+        if "bulk" in scenarios:
+            results["scenarios"]["bulk"] = scenario_bulk(notes, args.chunk_size, args.bulk_concurrency)
+        if "edit" in scenarios:
+            results["scenarios"]["edit"] = scenario_edit(base_url, notes, min(len(notes), 20), args.seed)
+    finally:
+        if server is not None:
+            server.should_exit = True
+        mock.shutdown()
+
+    results["mock_groq"] = dict(mock.RequestHandlerClass.stats)
+
+    exit_code = 0
+    if results["scenarios"].get("edit", {}).get("failures"):
+        exit_code = 1           # timing edits that changed nothing would be meaningless
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance)
+        exit_code = 1 if results["regressions"] else exit_code
+
+    text = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
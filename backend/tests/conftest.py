@@ -0,0 +1,46 @@
+"""
+Test setup: a throwaway SQLite database and index directory, Groq unconfigured
+(every tool runs its regex fallback), so the suite needs no network or API key.
+Environment is set before app modules are imported because they read it at import.
+"""
+
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="hcp-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP, 'test.db')}",
+    "GROQ_API_URL": "",
+    "GROQ_API_KEY": "",
+    "LLM_CACHE_ENABLED": "false",
+    "SIMILARITY_DIR": os.path.join(_TMP, "similarity_index"),
+    "SENTIMENT_MODEL_PATH": os.path.join(_TMP, "sentiment_model.npz"),
+    "LOG_PATH": os.path.join(_TMP, "langgraph_debug.log"),
+})
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app import main
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def schema():
+    from app import models
+    from app.database import sync_schema
+    sync_schema(models.Base.metadata)
+
+
+@pytest.fixture
+def db(schema):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
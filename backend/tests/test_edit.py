@@ -0,0 +1,39 @@
+def _log(client, text):
+    resp = client.post("/api/interactions/chat", json={"text": text, "mode": "sync"})
+    assert resp.status_code == 200
+    return resp.json()["interaction_id"]
+
+
+def test_edit_patches_only_the_corrected_field(client):
+    interaction_id = _log(client, "Met Dr. Rao on 12 Jan 2025 at 14:00, discussed dosing. Shared a brochure.")
+
+    resp = client.post(f"/api/interactions/edit/{interaction_id}", json={"text": "actually it was 3 pm"})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["tools"] == ["time"]
+    assert body["changed_fields"] == ["time"]
+    assert body["updated"]["time"] == "15:00"
+    assert body["updated"]["hcp_name"] == "Dr. Rao"
+
+
+def test_edit_unknown_interaction_is_404(client):
+    resp = client.post("/api/interactions/edit/does-not-exist", json={"text": "at 3 pm"})
+    assert resp.status_code == 404
+
+
+def test_entities_endpoint(client):
+    resp = client.post("/api/interactions/entities",
+                       json={"text": "Discussed pricing, shared a brochure and 5 samples."})
+
+    assert resp.status_code == 200
+    entities = resp.json()["entities"]
+    assert entities["materials_shared"] == ["Brochure"]
+    assert entities["samples_distributed"] == ["5 sample(s)"]
+
+
+def test_dispatch_tool_rejects_unknown_tool():
+    import pytest
+    from app import langgraph_tools
+    with pytest.raises(ValueError):
+        langgraph_tools.dispatch_tool("nope", "text")
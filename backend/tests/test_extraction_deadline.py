@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import langgraph_tools, metrics
+
+
+def _tool(name, seconds, value):
+    def fn(text):
+        time.sleep(seconds)
+        return {"hcp_name": value}
+    return (name, fn, langgraph_tools._merge_update)
+
+
+def _small_pool(monkeypatch, workers):
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract-test")
+    monkeypatch.setattr(langgraph_tools, "_extraction_pool", pool)
+    return pool
+
+
+def test_deadline_caps_the_whole_request(monkeypatch):
+    pool = _small_pool(monkeypatch, 1)
+    running = metrics.EXTRACTION_TIMEOUTS.value(tool="extract_hcp_name", stage="running")
+    queued = metrics.EXTRACTION_TIMEOUTS.value(tool="extract_date", stage="queued")
+
+    # one worker: the first tool overruns the deadline, the second never gets to start
+    tools = [_tool("extract_hcp_name", 0.5, "Dr. Slow"), _tool("extract_date", 0.0, "never")]
+    started = time.monotonic()
+    out = langgraph_tools.empty_output()
+    langgraph_tools._run_concurrent("note", out, 0.2, tools)
+    elapsed = time.monotonic() - started
+
+    assert out["hcp_name"] is None
+    assert elapsed < 0.4
+    assert metrics.EXTRACTION_TIMEOUTS.value(tool="extract_hcp_name", stage="running") == running + 1
+    assert metrics.EXTRACTION_TIMEOUTS.value(tool="extract_date", stage="queued") == queued + 1
+    pool.shutdown(wait=False)
+
+
+def test_time_spent_queued_counts_against_the_deadline(monkeypatch):
+    pool = _small_pool(monkeypatch, 1)
+    release = threading.Event()
+    pool.submit(release.wait, 5)                       # another request holds the only worker
+
+    started = time.monotonic()
+    results = list(langgraph_tools.iter_extraction("Met Dr. Queue today.", deadline=0.2, rules_threshold=2))
+    elapsed = time.monotonic() - started
+    release.set()
+
+    assert elapsed < 0.4
+    assert {name for name, _ in results} == {name for name, _, _ in langgraph_tools.EXTRACTION_TOOLS}
+    assert dict(results)["summarize_interaction"] == {"summary": "Met Dr. Queue today."}
+    pool.shutdown(wait=False)
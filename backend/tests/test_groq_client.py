@@ -0,0 +1,22 @@
+import time
+
+from app import groq_client
+
+
+def test_a_short_bucket_spends_nothing():
+    client = groq_client.GroqClient(rpm=60, tpm=600)
+    client.token_bucket.tokens = 0.0                    # token budget used up for now
+    payload = {"messages": [{"content": "x" * 400}], "max_tokens": 100}
+
+    assert not client._throttle(payload, deadline=time.monotonic() + 0.01)
+    assert client.request_bucket.tokens == 60           # the request token was not spent
+
+    client.token_bucket.tokens = 600.0
+    assert client._throttle(payload, deadline=time.monotonic() + 0.01)
+    assert client.request_bucket.tokens < 60
+    assert client.token_bucket.tokens < 600
+
+
+def test_unthrottled_by_default():
+    client = groq_client.GroqClient()
+    assert groq_client.GROQ_RPM == 0 and client.request_bucket is None
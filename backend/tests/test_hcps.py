@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from app import hcps
+from app.models import Hcp
+
+
+def test_hcps_written_by_another_process_are_found(db):
+    hcps.get_index()                    # this process loaded its index already
+    # another worker / the ingest CLI commits a new HCP behind our back
+    key = hcps.normalize("Dr. Zed Banda")
+    db.execute(Hcp.__table__.insert().values(id=hcps.hcp_id_for(key), name="Dr. Zed Banda",
+                                             normalized_key=key, created_at=datetime.utcnow()))
+    db.commit()
+
+    assert hcps.lookup("Dr. Banda") == hcps.hcp_id_for(key)
+    assert hcps.resolve(db, "Dr. Z. Banda") == hcps.hcp_id_for(key)
+    assert hcps.display_name(hcps.hcp_id_for(key)) == "Dr. Zed Banda"
+    db.rollback()
+    assert db.query(Hcp).filter(Hcp.normalized_key.like("%banda")).count() == 1
@@ -0,0 +1,44 @@
+import threading
+import time
+
+from app import langgraph_tools
+
+
+def _fake_groq(slow_model):
+    calls = []
+
+    def request(messages, max_tokens, temperature, timeout, response_format=None, model=None,
+                url=None, api_key=None):
+        calls.append((model, threading.current_thread().name))
+        time.sleep(0.3 if model == slow_model else 0.0)
+        return model
+
+    return request, calls
+
+
+def _configure(monkeypatch, ratio):
+    monkeypatch.setattr(langgraph_tools, "GROQ_HEDGE_PERCENTILE", 0)
+    monkeypatch.setattr(langgraph_tools, "GROQ_HEDGE_AFTER_MS", 50)
+    monkeypatch.setattr(langgraph_tools, "GROQ_HEDGE_MODEL", "fast")
+    monkeypatch.setattr(langgraph_tools, "_hedge_budget", langgraph_tools._HedgeBudget(ratio))
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    request, calls = _fake_groq(slow_model="slow")
+    monkeypatch.setattr(langgraph_tools, "_groq_request", request)
+    _configure(monkeypatch, ratio=0.05)
+
+    assert langgraph_tools._hedged_request([], 10, 0.0, 5, None, "slow") == "fast"
+    assert [m for m, _ in calls] == ["slow", "fast"]
+    assert calls[0][1] == "groq-primary"
+
+
+def test_hedges_are_capped_by_the_budget(monkeypatch):
+    request, calls = _fake_groq(slow_model="slow")
+    monkeypatch.setattr(langgraph_tools, "_groq_request", request)
+    _configure(monkeypatch, ratio=0.0)
+
+    results = [langgraph_tools._hedged_request([], 10, 0.0, 5, None, "slow") for _ in range(3)]
+    # the starting token allows one hedge; with no refill the rest wait for their primary
+    assert results == ["fast", "slow", "slow"]
+    assert sum(1 for m, _ in calls if m == "fast") == 1
@@ -0,0 +1,24 @@
+import pytest
+
+from app import items
+
+
+@pytest.mark.parametrize("value, product, quantity", [
+    ("3 x Product-X", "Product-X", 3),
+    ("3x Product-X", "Product-X", 3),
+    ("Product-X (2)", "Product-X", 2),
+    ("Product-X x 4", "Product-X", 4),
+    ("Product-X 2", "Product-X", 2),
+    ("3 xylitol tablets", "xylitol tablets", 3),
+    ("10mg Cardiozen", "10mg Cardiozen", 1),
+    ("10 mg Cardiozen", "10 mg Cardiozen", 1),
+    ("2024 Clinical Study Reprint", "2024 Clinical Study Reprint", 1),
+    ("Clinical Study Reprint 2024", "Clinical Study Reprint 2024", 1),
+    ("2000 copies of the brochure", "the brochure", 2000),
+])
+def test_parse_quantity_and_product(value, product, quantity):
+    assert items.parse("material", value) == (value, product, quantity)
+
+
+def test_sample_count_takes_product_from_note():
+    assert items.parse("sample", "5 samples", "left 5 samples of Product-X") == ("5 samples", "Product-X", 5)
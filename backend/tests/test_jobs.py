@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from app import crud, jobs, langgraph_tools
+from app.models import Interaction
+
+
+def _pending(db, text="Met Dr. Lease today."):
+    return crud.create_pending_interaction(db, text).id
+
+
+def test_a_job_is_claimed_once(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(langgraph_tools, "run_extraction", lambda text: calls.append(text) or {"summary": text})
+    interaction_id = _pending(db)
+
+    assert crud.claim_interaction(db, interaction_id, jobs.JOB_LEASE_SECONDS)    # a sibling worker has it
+    assert interaction_id not in crud.get_unfinished_interaction_ids(db, jobs.JOB_LEASE_SECONDS)
+    jobs.process_interaction(interaction_id)
+    assert calls == []
+
+    # the sibling died: once the lease runs out the row is recovered and runs here
+    db.query(Interaction).filter(Interaction.id == interaction_id).update(
+        {"claimed_at": datetime.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)})
+    db.commit()
+    assert interaction_id in crud.get_unfinished_interaction_ids(db, jobs.JOB_LEASE_SECONDS)
+    jobs.process_interaction(interaction_id)
+    db.expire_all()
+    assert calls == ["Met Dr. Lease today."]
+    assert crud.get_interaction(db, interaction_id).status == "done"
+
+
+def test_a_db_error_marks_the_job_failed(db, monkeypatch):
+    monkeypatch.setattr(langgraph_tools, "run_extraction", lambda text: {"summary": text})
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(crud, "update_interaction", broken)
+    interaction_id = _pending(db)
+
+    jobs.process_interaction(interaction_id)
+    db.expire_all()
+    obj = crud.get_interaction(db, interaction_id)
+    assert obj.status == "failed"
+    assert "database is locked" in obj.error
@@ -0,0 +1,41 @@
+from app import crud, rollups
+from app.models import HcpRollup, HcpRollupItem
+
+
+def _snapshot(db):
+    rows = {(r.hcp_id, r.period, r.period_start): (r.interactions, r.positive, r.neutral, r.negative,
+                                                  r.materials, r.samples)
+            for r in db.query(HcpRollup) if r.interactions}
+    items = {(r.hcp_id, r.period, r.period_start, r.kind, r.item): r.count
+             for r in db.query(HcpRollupItem) if r.count}
+    return rows, items
+
+
+def test_bulk_insert_matches_rebuild(db):
+    data = [
+        ({"hcp_name": "Dr. Okafor", "date": "2025-03-03", "sentiment": "Positive",
+          "materials_shared": ["Brochure"]}, "a"),
+        ({"hcp_name": "dr okafor", "date": "2025-03-04", "sentiment": "Negative",
+          "samples_distributed": ["5 sample(s)"]}, "b"),
+        ({"hcp_name": "Dr. Haddad", "date": "2025-03-04"}, "c"),
+    ]
+    ids = crud.bulk_create_interactions(db, data)
+    hcp_id = crud.get_interaction(db, ids[0]).hcp_id
+    assert crud.get_interaction(db, ids[1]).hcp_id == hcp_id
+
+    incremental = _snapshot(db)
+    dashboard = rollups.hcp_dashboard(db, hcp_id)
+    assert dashboard["hcp_name"] == "Dr. Okafor"
+    assert dashboard["totals"]["interactions"] == 2
+
+    rollups.rebuild(db)
+    assert _snapshot(db) == incremental
+
+
+def test_edit_moves_the_contribution(db):
+    [interaction_id] = crud.bulk_create_interactions(
+        db, [({"hcp_name": "Dr. Novak", "date": "2025-04-01", "sentiment": "Neutral"}, "d")])
+    crud.patch_interaction(db, interaction_id, {"hcp_name": "Dr. Iyer", "sentiment": "Positive"})
+    incremental = _snapshot(db)
+    rollups.rebuild(db)
+    assert _snapshot(db) == incremental
@@ -0,0 +1,39 @@
+from app import rules, langgraph_tools
+
+KITS = "Met Dr. Rao, discussed pricing, handed over two Glucobal starter kits and the dosing card."
+
+
+def _remaining(text):
+    _resolved, remaining = langgraph_tools._rules_pass(text)
+    return [name for name, _fn, _merge in remaining]
+
+
+def test_empty_item_lists_are_not_confident():
+    ruled = rules.extract(KITS)
+    threshold = langgraph_tools.RULES_CONFIDENCE_THRESHOLD
+    assert ruled["materials_shared"].confidence < threshold
+    assert ruled["samples_distributed"].confidence < threshold
+    assert "extract_materials_and_topics" in _remaining(KITS)
+
+
+def test_keyword_only_item_lists_still_run_the_tool():
+    text = "Met Dr. Rao on 1 Jan 2025 at 2 pm, discussed dosing, shared brochure and 5 samples."
+    ruled = rules.extract(text)
+    assert ruled["materials_shared"].value == ["Brochure"]
+    assert ruled["materials_shared"].confidence < langgraph_tools.RULES_CONFIDENCE_THRESHOLD
+    assert "extract_materials_and_topics" in _remaining(text)
+
+
+def test_labelled_item_lists_are_resolved_by_rules():
+    text = "Met Dr. Rao. Discussed dosing.\nMaterials shared: Brochure, dosing card\nSamples: none\n"
+    ruled = rules.extract(text)
+    assert ruled["materials_shared"] == rules.Ruled(["Brochure", "dosing card"], 0.95)
+    assert ruled["samples_distributed"] == rules.Ruled([], 0.95)
+    assert "extract_materials_and_topics" not in _remaining(text)
+
+
+def test_confident_fields_skip_their_tools():
+    text = "Met Dr. Rao on 2025-01-12 at 14:30, observed/inferred hcp sentiment: positive."
+    remaining = _remaining(text)
+    for name in ("extract_hcp_name", "extract_date", "extract_time", "extract_sentiment"):
+        assert name not in remaining
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import models, search
+
+
+@pytest.fixture
+def fts_db(tmp_path, monkeypatch):
+    # a private database: these tests rewrite the interaction table
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    models.Interaction.__table__.create(engine)
+    monkeypatch.setitem(search._state, "backend", "sqlite")
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _add(db, rows):
+    db.add_all(models.Interaction(id=i, raw_text=raw, summary=summary, topics_discussed=topics)
+               for i, raw, summary, topics in rows)
+    db.commit()
+    search._setup_fts5(db.connection())     # backfill, as at startup
+    db.commit()
+
+
+def _ids(db, q):
+    return [hit[0] for hit in search.search_interactions(db, q)]
+
+
+def test_search_survives_renumbered_rowids(fts_db):
+    _add(fts_db, [
+        ("a", "first note mentions zebrafish", "zebrafish note", None),
+        ("b", "second note mentions okapi", "okapi note", None),
+        ("c", "third note mentions narwhal", "narwhal note", None),
+    ])
+    # what VACUUM may do to implicit rowids (as do dump/restore and table rebuilds):
+    # the same rows come back under different rowids
+    fts_db.execute(text("CREATE TEMP TABLE interaction_copy AS SELECT * FROM interaction ORDER BY id DESC"))
+    fts_db.execute(text("DELETE FROM interaction"))
+    fts_db.execute(text("INSERT INTO interaction SELECT * FROM interaction_copy"))
+    fts_db.execute(text("DROP TABLE interaction_copy"))
+    fts_db.commit()
+
+    for interaction_id, word in (("a", "zebrafish"), ("b", "okapi"), ("c", "narwhal")):
+        assert _ids(fts_db, word) == [interaction_id]
+
+
+def test_summary_and_topics_rank_above_raw_text(fts_db):
+    _add(fts_db, [
+        ("raw", "discussed pelican dosing", "met the doctor", "general update"),
+        ("topics", "met the doctor today", "general update", "pelican dosing"),
+        ("summary", "met the doctor today", "pelican dosing", "general update"),
+    ])
+    ranked = _ids(fts_db, "pelican")
+    assert ranked[-1] == "raw"
+    assert set(ranked[:2]) == {"topics", "summary"}
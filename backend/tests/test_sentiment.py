@@ -0,0 +1,28 @@
+from app import langgraph_tools, rules, sentiment_model
+
+
+def test_rules_sentiment_is_negation_aware():
+    assert rules.sentiment("HCP did not find the trial data good.")[0].value == "Negative"
+    assert rules.sentiment("Dr. Rao liked the data.")[0].value == "Positive"
+
+
+def test_unsure_classifier_defers_to_the_llm(monkeypatch):
+    monkeypatch.setattr(sentiment_model, "get_model", lambda: object())
+    monkeypatch.setattr(sentiment_model, "predict", lambda text, threshold=None: None)
+    asked = []
+
+    def fake_ask(tool, system, text):
+        asked.append(tool)
+        return '{"sentiment": "Neutral"}'
+
+    monkeypatch.setattr(langgraph_tools, "_ask", fake_ask)
+    result = langgraph_tools.extract_sentiment("They liked parts of it, hard to say overall.")
+    assert asked == ["sentiment"]
+    assert result == {"sentiment": "Neutral", "sentiment_source": "inferred"}
+
+
+def test_explicit_label_wins_over_classifier(monkeypatch):
+    monkeypatch.setattr(sentiment_model, "get_model", lambda: object())
+    monkeypatch.setattr(sentiment_model, "predict", lambda text, threshold=None: ("Positive", 0.99))
+    result = langgraph_tools.extract_sentiment("observed/inferred hcp sentiment: negative")
+    assert result == {"sentiment": "Negative", "sentiment_source": "observed"}
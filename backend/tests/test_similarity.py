@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+from app import similarity
+
+
+def test_index_sees_rows_appended_by_another_process(tmp_path):
+    index = similarity.VectorIndex(str(tmp_path))
+    index.add_many([("a" * 36, similarity.embed("pricing dosing cardiozen"))])
+    writer = (
+        "import sys; from app import similarity as s\n"
+        "s.VectorIndex(sys.argv[1]).add_many([('b' * 36, s.embed('glucobal starter kits'))])\n"
+    )
+    subprocess.run([sys.executable, "-c", writer, str(tmp_path)], check=True)
+
+    hits = index.search(similarity.embed("glucobal starter kits"), k=1)
+    assert hits[0][0] == "b" * 36
+    assert index.count == 2
+
+
+def test_index_notices_a_rebuild_by_another_instance(tmp_path):
+    reader, writer = similarity.VectorIndex(str(tmp_path)), similarity.VectorIndex(str(tmp_path))
+    writer.add_many([("a" * 36, similarity.embed("pricing"))])
+    assert reader.search(similarity.embed("pricing"), k=1)[0][0] == "a" * 36
+    writer.clear()
+    writer.add_many([("c" * 36, similarity.embed("pricing"))])
+    assert reader.search(similarity.embed("pricing"), k=5) == [("c" * 36, pytest.approx(1.0))]
+
+
+def test_next_best_action(client):
+    text = "Dr. Chen asked about Neurolix dosing and patient adherence programmes"
+    first = client.post("/api/interactions/chat", json={"text": text, "mode": "sync"}).json()
+    twin = client.post("/api/interactions/chat", json={"text": text, "mode": "sync"}).json()
+
+    for payload in ({"data": first["data"], "interaction_id": first["interaction_id"]},
+                    {"interaction_id": first["interaction_id"]}):
+        resp = client.post("/api/interactions/next-best-action", json=payload)
+        assert resp.status_code == 200
+        similar = [s["interaction_id"] for s in resp.json()["similar"]]
+        # the note itself is left out, an identical note under another id is the top hit
+        assert first["interaction_id"] not in similar
+        assert similar[0] == twin["interaction_id"]
+
+    # text only: nothing to exclude, so identical notes are not dropped by score either
+    resp = client.post("/api/interactions/next-best-action", json={"data": first["data"]})
+    similar = [s["interaction_id"] for s in resp.json()["similar"]]
+    assert set(similar[:2]) == {first["interaction_id"], twin["interaction_id"]}
+
+    assert client.post("/api/interactions/next-best-action",
+                       json={"data": first["data"], "k": "ten"}).status_code == 400